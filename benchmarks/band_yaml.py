@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+
+
+__author__ = "Yuji Ikeda"
+
+
+def write_band_yaml(filename, nqpoint, natom, npath=4, with_eigenvectors=True):
+    nband = natom * 3
+    rng = np.random.RandomState(0)
+    with open(filename, "w") as f:
+        f.write("nqpoint: {}\n".format(nqpoint))
+        f.write("npath: {}\n".format(npath))
+        f.write("segment_nqpoint:\n")
+        for _ in range(npath):
+            f.write("- {}\n".format(nqpoint // npath))
+        f.write("natom: {}\n".format(natom))
+        f.write("\nphonon:\n")
+        for iq in range(nqpoint):
+            f.write("- q-position: [ {0:12.7f}, {0:12.7f}, {0:12.7f} ]\n".format(
+                iq / nqpoint))
+            f.write("  distance: {:15.7f}\n".format(iq * 0.01))
+            f.write("  band:\n")
+            for ib, freq in enumerate(rng.rand(nband) * 10.0):
+                f.write("  - # {}\n".format(ib + 1))
+                f.write("    frequency: {:20.10f}\n".format(freq))
+                if with_eigenvectors:
+                    f.write("    eigenvector:\n")
+                    for ia in range(natom):
+                        f.write("    - # atom {}\n".format(ia + 1))
+                        for _ in range(3):
+                            f.write("      - [ {:17.14f}, {:17.14f} ]\n".format(
+                                0.5, 0.0))
+            f.write("\n")
+
+
+def run(variables):
+    from ph_plotter.file_io import _read_band_yaml_stream, _read_band_yaml_full
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        for nqpoint in variables["nqpoints"]:
+            filename = os.path.join(tmpdir, "band.yaml")
+            write_band_yaml(
+                filename, nqpoint, variables["natom"],
+                with_eigenvectors=not variables["no_eigenvectors"])
+            size = os.path.getsize(filename) / 1024.0 ** 2
+            print("nqpoint: {:8d}  size: {:10.1f} MiB".format(nqpoint, size))
+
+            t0 = time.time()
+            d0, f0 = _read_band_yaml_stream(filename)
+            print("  stream: {:10.3f} s".format(time.time() - t0))
+
+            if nqpoint > variables["max_nqpoint_full"]:
+                print("  yaml:   skipped")
+                continue
+            t0 = time.time()
+            d1, f1 = _read_band_yaml_full(filename)
+            print("  yaml:   {:10.3f} s".format(time.time() - t0))
+            assert np.array_equal(d0, d1) and np.array_equal(f0, f1)
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nqpoints",
+                        nargs="+",
+                        default=[10000, 100000],
+                        type=int,
+                        help="Numbers of q-points benchmarked.")
+    parser.add_argument("--natom",
+                        default=2,
+                        type=int,
+                        help="Number of atoms.")
+    parser.add_argument("--no_eigenvectors",
+                        action="store_true",
+                        help="Write band.yaml without eigenvectors.")
+    parser.add_argument("--max_nqpoint_full",
+                        default=10000,
+                        type=int,
+                        help="Largest nqpoint also read by the full YAML parser.")
+    args = parser.parse_args()
+
+    print(vars(args))
+    run(vars(args))
+
+
+if __name__ == "__main__":
+    main()
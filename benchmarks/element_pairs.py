@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import time
+import numpy as np
+
+
+__author__ = "Yuji Ikeda"
+
+
+def create_selected_sf_elements_point(partial_sf_e, elements, combinations_elements):
+    """Reference implementation summing the element pairs at one q-point
+
+    This is the per-q-point loop BandSFPlotter used before the element pairs
+    were reduced at load time.
+    """
+    partial_sf_point = np.zeros(partial_sf_e.shape[0], dtype=complex)
+    for combination_elements in combinations_elements:
+        ie0 = list(elements).index(combination_elements[0])
+        ie1 = list(elements).index(combination_elements[1])
+        partial_sf_point += np.sum(partial_sf_e[:, :, ie0, :, ie1], axis=(1, 2))
+        if ie0 != ie1:
+            partial_sf_point += np.sum(partial_sf_e[:, :, ie1, :, ie0], axis=(1, 2))
+    partial_sf_point = partial_sf_point.real
+    return partial_sf_point
+
+
+def run(variables):
+    from ph_plotter.sf_data import (
+        create_element_pair_weights, reduce_element_pairs,
+        contract_element_pairs)
+
+    nq = variables["nq"]
+    nfreq = variables["nfreq"]
+    elements = ["E{}".format(i) for i in range(variables["nelements"])]
+    combinations_elements = [
+        [e0, e1] for i, e0 in enumerate(elements) for e1 in elements[i:]]
+
+    rng = np.random.RandomState(0)
+    shape = (nq, nfreq, 3, len(elements), 3, len(elements))
+    partial_sf_e = rng.rand(*shape) + 1j * rng.rand(*shape)
+    print("partial_sf_e: {}  {:.1f} MiB".format(
+        shape, partial_sf_e.nbytes / 1024.0 ** 2))
+
+    t0 = time.time()
+    sf_loop = np.zeros((nq, nfreq))
+    for iq in range(nq):
+        sf_loop[iq] = create_selected_sf_elements_point(
+            partial_sf_e[iq], elements, combinations_elements)
+    print("  per-point loop: {:10.3f} s".format(time.time() - t0))
+
+    t0 = time.time()
+    sf_element_pairs = reduce_element_pairs(partial_sf_e)
+    print("  reduction:      {:10.3f} s".format(time.time() - t0))
+
+    t0 = time.time()
+    weights = create_element_pair_weights(elements, combinations_elements)
+    sf_kernel = contract_element_pairs(sf_element_pairs, weights)
+    print("  contraction:    {:10.3f} s".format(time.time() - t0))
+
+    print("  max. abs. diff.: {:.3e}".format(np.max(np.abs(sf_loop - sf_kernel))))
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nq",
+                        default=2000,
+                        type=int,
+                        help="Number of q-points.")
+    parser.add_argument("--nfreq",
+                        default=500,
+                        type=int,
+                        help="Number of frequency points.")
+    parser.add_argument("--nelements",
+                        default=2,
+                        type=int,
+                        help="Number of chemical elements.")
+    args = parser.parse_args()
+
+    print(vars(args))
+    run(vars(args))
+
+
+if __name__ == "__main__":
+    main()
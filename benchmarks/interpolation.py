@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import time
+import numpy as np
+
+
+__author__ = "Yuji Ikeda"
+
+
+def create_grid(npaths, npoints, nfreq):
+    """Create spectral functions like those of band_sf on the plot grid"""
+    distances = np.concatenate(
+        [np.linspace(i, i + 1, npoints) for i in range(npaths)])
+    frequencies = np.linspace(-2.0, 10.0, nfreq)
+    xs, ys = np.meshgrid(distances / npaths, frequencies, indexing="ij")
+    centers = 5.0 + 4.0 * np.sin(np.pi * distances)
+    zs = 1.0 / (1.0 + ((ys - centers[:, None]) / 0.2) ** 2)
+    return xs, ys, zs
+
+
+def run(variables):
+    from ph_plotter.band_sf_plotter import interpolate_data
+
+    xs, ys, zs = create_grid(
+        variables["npaths"], variables["npoints"], variables["nfreq"])
+    print("grid: {}".format(zs.shape))
+    interpolate_data(xs[:4], ys[:4], zs[:4], 2)  # Import SciPy in advance.
+
+    for n in variables["ninterps"]:
+        print("ninterp: {}".format(n))
+
+        t0 = time.time()
+        _, _, zs_spline = interpolate_data(xs, ys, zs, n, method="spline")
+        print("  spline:            {:10.3f} s".format(time.time() - t0))
+
+        t0 = time.time()
+        _, _, zs_parallel = interpolate_data(
+            xs, ys, zs, n, method="spline", nworkers=variables["nworkers"])
+        print("  spline ({} threads): {:8.3f} s".format(
+            variables["nworkers"], time.time() - t0))
+        assert np.array_equal(zs_spline, zs_parallel)
+
+        if n > variables["max_ninterp_griddata"]:
+            print("  griddata:          skipped")
+            continue
+        t0 = time.time()
+        _, _, zs_griddata = interpolate_data(xs, ys, zs, n, method="griddata")
+        print("  griddata:          {:10.3f} s".format(time.time() - t0))
+        print("  max. abs. diff.: {:.3e}".format(
+            np.nanmax(np.abs(zs_spline - zs_griddata))))
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--npaths",
+                        default=4,
+                        type=int,
+                        help="Number of paths.")
+    parser.add_argument("--npoints",
+                        default=51,
+                        type=int,
+                        help="Number of q-points in each path.")
+    parser.add_argument("--nfreq",
+                        default=241,
+                        type=int,
+                        help="Number of frequency points.")
+    parser.add_argument("--ninterps",
+                        nargs="+",
+                        default=[2, 4, 8],
+                        type=int,
+                        help="Interpolation numbers benchmarked.")
+    parser.add_argument("--nworkers",
+                        default=4,
+                        type=int,
+                        help="Number of threads for the parallel spline.")
+    parser.add_argument("--max_ninterp_griddata",
+                        default=8,
+                        type=int,
+                        help="Largest ninterp also run with griddata.")
+    args = parser.parse_args()
+
+    print(vars(args))
+    run(vars(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+
+
+__author__ = "Yuji Ikeda"
+
+
+def write_text(filename, nrows, ncols, nrows_block=10 ** 6):
+    rng = np.random.RandomState(0)
+    with open(filename, "w") as f:
+        f.write("# Synthetic data\n")
+        for start in range(0, nrows, nrows_block):
+            n = min(nrows_block, nrows - start)
+            np.savetxt(f, rng.rand(n, ncols), fmt="%16.8f")
+
+
+def measure(label, function, nrepeats=3):
+    """Print the best time of `nrepeats` calls"""
+    times = []
+    for _ in range(nrepeats):
+        t0 = time.time()
+        data = function()
+        times.append(time.time() - t0)
+    print("  {:32s} {:10.3f} s".format(label, min(times)))
+    return data
+
+
+def run(variables):
+    from ph_plotter.file_io import read_text_columns
+
+    nrows = variables["nrows"]
+    ncols = variables["ncols"]
+    usecols = (0, 1, 2)
+    tmpdir = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(tmpdir, "sf.dat")
+        write_text(filename, nrows, ncols)
+        size = os.path.getsize(filename) / 1024.0 ** 2
+        print("nrows: {}  ncols: {}  size: {:.1f} MiB".format(nrows, ncols, size))
+
+        d0 = measure("np.loadtxt", lambda: np.loadtxt(filename).T)
+        d1 = measure("read_text_columns", lambda: read_text_columns(filename))
+        assert np.array_equal(d0, d1)
+
+        d0 = measure("np.loadtxt (usecols)",
+                     lambda: np.loadtxt(filename, usecols=usecols).T)
+        d1 = measure("read_text_columns (usecols)",
+                     lambda: read_text_columns(filename, usecols=usecols))
+        assert np.array_equal(d0, d1)
+
+        measure("read_text_columns (cache build)",
+                lambda: read_text_columns(filename, usecols, is_cached=True),
+                nrepeats=1)
+        d1 = measure("read_text_columns (cached)",
+                     lambda: read_text_columns(filename, usecols, is_cached=True))
+        assert np.array_equal(d0, d1)
+
+        d1 = measure("read_text_columns (cache rebuild)",
+                     lambda: read_text_columns(filename, is_cached=True),
+                     nrepeats=1)
+        assert np.array_equal(np.loadtxt(filename).T, d1)
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nrows",
+                        default=10 ** 7,
+                        type=int,
+                        help="Number of rows.")
+    parser.add_argument("--ncols",
+                        default=3,
+                        type=int,
+                        help="Number of columns.")
+    args = parser.parse_args()
+
+    print(vars(args))
+    run(vars(args))
+
+
+if __name__ == "__main__":
+    main()
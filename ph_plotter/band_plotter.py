@@ -8,13 +8,16 @@ __author__ = "Yuji Ikeda"
 import numpy as np
 from matplotlib.ticker import AutoMinorLocator
 from .plotter import Plotter, read_band_labels
-from .file_io import read_band_yaml
+from .file_io import read_band_yaml, read_band_yaml_cached
 
 
 class BandPlotter(Plotter):
     def load_data(self, data_file="band.yaml"):
         print("Reading band.yaml: ", end="")
-        distances, frequencies = read_band_yaml(yaml_file=data_file)
+        if self._variables["is_cached"]:
+            distances, frequencies = read_band_yaml_cached(data_file)
+        else:
+            distances, frequencies = read_band_yaml(yaml_file=data_file)
         print("Finished")
 
         self._distances = distances / distances[-1, -1]
@@ -63,9 +66,10 @@ class BandPlotter(Plotter):
 
         npath, nqpoint, nband = frequencies.shape
         for ipath in range(npath):
+            bands = self.find_visible_bands(frequencies[ipath])
             lines = ax.plot(
                 distances[ipath],
-                frequencies[ipath] * variables["unit"],
+                frequencies[ipath][:, bands] * variables["unit"],
                 color=variables["linecolor"],
                 dashes=variables["dashes"],
                 linewidth=variables["linewidth"],
@@ -9,6 +9,11 @@ __author__ = "Yuji Ikeda"
 
 
 class BandSFImshowPlotter(BandSFPlotter):
+    def _cull_data(self, distances, frequencies, sf):
+        # The image is stretched over [f_min, f_max], so all the frequencies
+        # are kept.
+        return distances, frequencies, sf
+
     def _plot_sf(self, ax, distances, frequencies, sf):
         variables = self._variables
 
@@ -2,16 +2,23 @@
 # -*- coding: utf-8 -*-
 from __future__ import (absolute_import, division,
                         print_function, unicode_literals)
+from collections import OrderedDict
 import numpy as np
 from matplotlib.ticker import AutoMinorLocator
+from ph_plotter.plotter import execute_layout, keep_layout, rasterize_artist
 from ph_plotter.sf_plotter import SFPlotter
 from ph_plotter.colormap_creator import ColormapCreator
+from ph_plotter.sf_data import (
+    create_element_pair_weights, contract_element_pairs, create_selection_key)
 
 
 __author__ = "Yuji Ikeda"
 
 
 class BandSFPlotter(SFPlotter):
+    # Resolution of the saved figures
+    _dpi = 288
+
     def configure(self, ax):
         variables = self._variables
 
@@ -57,11 +64,53 @@ class BandSFPlotter(SFPlotter):
         )
         self._colormap = cmap_creator.create_colormap(ticks=self._sf_ticks)
 
+    def _find_required_keys(self):
+        keys = ['total_sf']
+        for key_irs, key_pairs, key_elements in self._find_selection_keys():
+            if key_elements is not None:
+                key = 'partial_sf_e2'
+            elif key_irs is not None and key_pairs is not None:
+                key = 'partial_sf_s_e_pairs'
+            elif key_irs is not None:
+                key = 'partial_sf_s'
+            elif key_pairs is not None:
+                key = 'partial_sf_e_pairs'
+            else:
+                continue
+            if key not in keys:
+                keys.append(key)
+        return keys
+
+    def _find_selections(self):
+        """Return the selections plotted as a list of dicts"""
+        selections = self._variables['selections']
+        if selections is None:
+            selections = [{
+                'selected_irreps': self._variables['selected_irreps'],
+                'combinations_elements': self._variables['combinations_elements'],
+                'elements': self._variables['elements'],
+            }]
+        return selections
+
+    def _find_selection_keys(self):
+        return [self._create_selection_key(s) for s in self._find_selections()]
+
+    @staticmethod
+    def _create_selection_key(selection):
+        irs_selected = selection.get('selected_irreps')
+        combinations_elements = selection.get('combinations_elements')
+        elements = selection.get('elements')
+        if elements is not None:
+            irs_selected = combinations_elements = None
+        return create_selection_key(irs_selected, combinations_elements, elements)
+
     def modify_data(self, distances, frequencies, sf):
         ninterp = self._variables["ninterp"]
         if ninterp is not None:
             distances, frequencies, sf = interpolate_data(
-                distances, frequencies, sf, n=ninterp)
+                distances, frequencies, sf, n=ninterp,
+                method=self._variables["interpolation"],
+                nworkers=self._variables["interp_workers"])
         return distances, frequencies, sf
 
     def set_colormap(self, colormap):
@@ -74,22 +123,43 @@ class BandSFPlotter(SFPlotter):
         ----------
         ax : Matplotlib Axes object
         """
-        irs_selected = self._variables['selected_irreps']
-        combinations_elements = self._variables['combinations_elements']
-        elements = self._variables['elements']
+        sf = self.create_selected_sf(
+            self._variables['selected_irreps'],
+            self._variables['combinations_elements'],
+            self._variables['elements'],
+        )
+        self._plot_sf_pre(ax, sf)
 
-        if elements is not None:
-            sf = self._create_selected_sf_e2(elements)
-        elif irs_selected is not None and combinations_elements is not None:
-            sf = self._create_selected_sf_irs_and_elements(irs_selected, combinations_elements)
-        elif irs_selected is not None:
-            sf = self._create_selected_sf_irs(irs_selected)
-        elif combinations_elements is not None:
-            sf = self._create_selected_sf_elements(combinations_elements)
-        else:
-            sf = self.create_total_sf()
+    def create_selected_sf(self, irs_selected=None, combinations_elements=None,
+                           elements=None):
+        """Create partial sf for the selection, or total sf without one
 
-        self._plot_sf_pre(ax, sf)
+        The result is kept by the data points, and equivalent selections
+        afterwards return the same read-only array.
+        """
+        key = self._create_selection_key({
+            'selected_irreps': irs_selected,
+            'combinations_elements': combinations_elements,
+            'elements': elements,
+        })
+        return self._data_points.get_selection(
+            key, lambda: self._create_selected_sfs([key])[0])
+
+    def create_selected_sfs(self, selections):
+        """Create partial sf for many selections in one pass over the data
+
+        Parameters
+        ----------
+        selections : list of dicts
+            Each may have "selected_irreps", "combinations_elements" and
+            "elements" like the variables. An empty dict selects total sf.
+
+        Returns
+        -------
+        sfs : (nselections, nq, nfreq) array
+        """
+        keys = [self._create_selection_key(s) for s in selections]
+        return self._data_points.get_selections(keys, self._create_selected_sfs)
 
     def _plot_sf_pre(self, ax, sf):
         distances = self._xs
@@ -97,10 +167,17 @@ class BandSFPlotter(SFPlotter):
 
         distances, frequencies, sf = self.modify_data(
             distances, frequencies, sf)
+        distances, frequencies, sf = self._cull_data(
+            distances, frequencies, sf)
 
         self._object_plotted = self._plot_sf(
             ax, distances, frequencies, sf)
 
+    def _cull_data(self, distances, frequencies, sf):
+        """Drop the frequencies outside the plotted range"""
+        window = self.find_frequency_window(frequencies[0])
+        return distances[:, window], frequencies[:, window], sf[:, window]
+
     def plot_selected_sf_irs(self, ax, irs_selected):
         """
 
@@ -110,128 +187,203 @@ class BandSFPlotter(SFPlotter):
         irs_selected : Dictionary
             Keys are for point groups, and values are for IRs to be plotted.
         """
-        sf = self._create_selected_sf_irs(irs_selected)
+        sf = self.create_selected_sf(irs_selected=irs_selected)
         self._plot_sf_pre(ax, sf)
 
     def plot_sf_combinations_elements(self, ax, combinations_elements):
-        sf = self._create_selected_sf_elements(combinations_elements)
+        sf = self.create_selected_sf(combinations_elements=combinations_elements)
         self._plot_sf_pre(ax, sf)
 
     def plot_sf_irs_and_elements(self, ax, selected_irs, combinations_elements):
-        sf = self._create_selected_sf_irs_and_elements(selected_irs, combinations_elements)
+        sf = self.create_selected_sf(selected_irs, combinations_elements)
         self._plot_sf_pre(ax, sf)
 
-    def _create_selected_sf_irs(self, irs_selected):
+    def _create_selected_sfs(self, keys):
+        """Create partial sf for the keys from `create_selection_key`
+
+        Selections of the same kind share the traversal of their column.
+        """
         total_sf = self.create_total_sf()
-        partial_sf = np.zeros_like(total_sf)  # Initialization
-        for i, data_point in enumerate(self._data_points):
-            ir_labels = data_point['ir_labels']
-            pg_symbol = str(data_point['pointgroup_symbol'])
-            if pg_symbol in irs_selected:
-                for ir_label_selected in irs_selected[pg_symbol]:
-                    indices = np.where(ir_labels == ir_label_selected)
-                    for index in indices:
-                        partial_sf[i] += data_point['partial_sf_s'][:, index[0]]
-        return partial_sf
-
-    def _create_selected_sf_irs_and_elements(self, irs_selected, combinations_elements):
+        sfs = np.zeros((len(keys),) + total_sf.shape)  # Initialization
+
+        isels_e2 = []
+        isels_irs_and_elements = []
+        isels_irs = []
+        isels_elements = []
+        for isel, (key_irs, key_pairs, key_elements) in enumerate(keys):
+            if key_elements is not None:
+                isels_e2.append(isel)
+            elif key_irs is not None and key_pairs is not None:
+                isels_irs_and_elements.append(isel)
+            elif key_irs is not None:
+                isels_irs.append(isel)
+            elif key_pairs is not None:
+                isels_elements.append(isel)
+            else:
+                sfs[isel] = total_sf
+
+        if isels_e2:
+            sfs[isels_e2] = self._create_selected_sfs_e2(
+                [keys[i][2] for i in isels_e2])
+        if isels_irs_and_elements:
+            sfs[isels_irs_and_elements] = self._create_selected_sfs_irs_and_elements(
+                [keys[i][0] for i in isels_irs_and_elements],
+                [keys[i][1] for i in isels_irs_and_elements])
+        if isels_irs:
+            sfs[isels_irs] = self._create_selected_sfs_irs(
+                [keys[i][0] for i in isels_irs])
+        if isels_elements:
+            sfs[isels_elements] = self._create_selected_sfs_elements(
+                [keys[i][1] for i in isels_elements])
+        return sfs
+
+    def _create_selected_sfs_irs(self, list_irs_selected):
         total_sf = self.create_total_sf()
-        partial_sf = np.zeros_like(total_sf)  # Initialization
-        for i, data_point in enumerate(self._data_points):
-            elements = data_point['elements']
-            ir_labels = data_point['ir_labels']
-            pg_symbol = str(data_point['pointgroup_symbol'])
-            if pg_symbol in irs_selected:
-                for ir_label_selected in irs_selected[pg_symbol]:
-                    indices = np.where(ir_labels == ir_label_selected)
-                    for index in indices:
-                        partial_sf_e = data_point['partial_sf_s_e'][:, index[0]]
-                        partial_sf[i] += self._create_selected_sf_elements_point(
-                            partial_sf_e, elements, combinations_elements)
-        return partial_sf
-
-    def _create_selected_sf_elements(self, combinations_elements):
-        """Create partial sf for combinations of chemical elements
+        partial_sfs = np.zeros((len(list_irs_selected),) + total_sf.shape)
+        partial_sf_s = self._data_points.get_column('partial_sf_s')
+        for (iqs, irs), counts in self._find_selected_irreps(list_irs_selected):
+            partial_sfs[:, iqs] += (
+                counts[:, None, None] * partial_sf_s[iqs, :, irs][None])
+        return partial_sfs
+
+    def _create_selected_sfs_irs_and_elements(self, list_irs_selected,
+                                              list_combinations_elements):
+        elements = self._data_points.get_elements()
+        weights = np.array([
+            create_element_pair_weights(elements, combinations_elements)
+            for combinations_elements in list_combinations_elements])
+        total_sf = self.create_total_sf()
+        partial_sfs = np.zeros((len(list_irs_selected),) + total_sf.shape)
+        sf_element_pairs = self._data_points.get_column('partial_sf_s_e_pairs')
+        for (iqs, irs), counts in self._find_selected_irreps(list_irs_selected):
+            partial_sfs[:, iqs] += counts[:, None, None] * contract_element_pairs(
+                sf_element_pairs[iqs, :, irs], weights)
+        return partial_sfs
+
+    def _find_selected_irreps(self, list_irs_selected):
+        """Yield `((iqs, irs), counts)` of the selected irreps
 
         Parameters
         ----------
-        combinations_elements:  list of lists
-            [['Cu', 'Cu'], ['Au', 'Au']]
+        list_irs_selected : list
+            Selections of irreps like `irs_selected`, e.g. from
+            `create_selection_key`.
+
+        Yields
+        ------
+        (iqs, irs) : tuple
+            Entry of the irreps index. Each entry is yielded only once.
+        counts : (nselections, ) array
+            How many times each selection includes the entry.
         """
-        total_sf = self.create_total_sf()
-        partial_sf = np.zeros(total_sf.shape, dtype=complex)  # Initialization
-        for i, data_point in enumerate(self._data_points):
-            elements = data_point['elements']
-            partial_sf_e = data_point['partial_sf_e']
-            partial_sf[i] = self._create_selected_sf_elements_point(
-                partial_sf_e, elements, combinations_elements)
-        partial_sf = partial_sf.real
-        return partial_sf
+        index = self._data_points.get_irreps_index()
+        counts = OrderedDict()
+        for isel, irs_selected in enumerate(list_irs_selected):
+            for pg_symbol, ir_labels_selected in dict(irs_selected).items():
+                for ir_label_selected in ir_labels_selected:
+                    key = (pg_symbol, ir_label_selected)
+                    if key in index:
+                        if key not in counts:
+                            counts[key] = np.zeros(len(list_irs_selected))
+                        counts[key][isel] += 1.0
+        for key, counts_key in counts.items():
+            yield index[key], counts_key
+
+    def _create_selected_sfs_elements(self, list_combinations_elements):
+        """Create partial sf for combinations of chemical elements
 
-    @staticmethod
-    def _create_selected_sf_elements_point(partial_sf_e, elements, combinations_elements):
-        partial_sf_point = np.zeros(partial_sf_e.shape[0], dtype=complex)
-        for combination_elements in combinations_elements:
-            ie0 = list(elements).index(combination_elements[0])
-            ie1 = list(elements).index(combination_elements[1])
-            partial_sf_point += np.sum(partial_sf_e[:, :, ie0, :, ie1], axis=(1, 2))
-            if ie0 != ie1:
-                partial_sf_point += np.sum(partial_sf_e[:, :, ie1, :, ie0], axis=(1, 2))
-        partial_sf_point = partial_sf_point.real
-        return partial_sf_point
-
-    def _create_selected_sf_e2(self, elements_plotted):
+        Parameters
+        ----------
+        list_combinations_elements:  list of lists of lists
+            [[['Cu', 'Cu'], ['Au', 'Au']], [['Cu', 'Au']]]
+        """
+        elements = self._data_points.get_elements()
+        weights = np.array([
+            create_element_pair_weights(elements, combinations_elements)
+            for combinations_elements in list_combinations_elements])
+        sf_element_pairs = self._data_points.get_column('partial_sf_e_pairs')
+        return contract_element_pairs(sf_element_pairs, weights)
+
+    def _create_selected_sfs_e2(self, list_elements_plotted):
         """Create partial sf for chemical elements (no-cross term scheme)
 
         Parameters
         ----------
-        elements : list
-            ['Cu', 'Au']
+        list_elements_plotted : list of lists
+            [['Cu', 'Au'], ['Au']]
         """
-        total_sf = self.create_total_sf()
-        partial_sf = np.zeros_like(total_sf)  # Initialization
-        for i, data_point in enumerate(self._data_points):
-            elements = data_point['elements']
-            partial_sf_e2 = data_point['partial_sf_e2']
-            partial_sf[i] = self._create_selected_sf_e2_point(
-                partial_sf_e2, elements, elements_plotted)
-        return partial_sf
-
-    @staticmethod
-    def _create_selected_sf_e2_point(partial_sf_e2, elements, elements_plotted):
-        partial_sf_point = np.zeros(partial_sf_e2.shape[0])
-        for e0 in elements_plotted:
-            ie0 = list(elements).index(e0)
-            partial_sf_point += np.sum(partial_sf_e2[:, :, ie0], axis=1)
-        return partial_sf_point
+        elements = self._data_points.get_elements()
+        counts = np.zeros((len(list_elements_plotted), len(elements)))
+        for isel, elements_plotted in enumerate(list_elements_plotted):
+            for e0 in elements_plotted:
+                counts[isel, elements.index(e0)] += 1.0
+        partial_sf_e2 = self._data_points.get_column('partial_sf_e2')
+        return np.tensordot(counts, np.sum(partial_sf_e2, axis=2), axes=([1], [2]))
 
     def _plot_sf(self, ax, distances, frequencies, sf):
         raise NotImplementedError
 
-    def create_figure_name(self):
+    def create_figure(self):
+        selections = self._variables['selections']
+        if selections is None:
+            super(BandSFPlotter, self).create_figure()
+            return
+
+        # All the selections are created in one pass before plotting.
+        sfs = self.create_selected_sfs(selections)
+        for isel, (selection, sf) in enumerate(zip(selections, sfs)):
+            fig, ax = self.prepare_figure()
+            figure_name = self.create_figure_name(
+                selection.get('name', str(isel)))
+
+            self.configure(ax)
+            self._plot_sf_pre(ax, sf)
+            self.save_figure(fig, figure_name)
+
+            self.close()
+
+    def create_figure_name(self, label=None):
         variables = self._variables
-        figure_name = "band_sf_{}.{}".format(
-            variables["freq_unit"],
-            variables["figure_type"])
+        if label is None:
+            figure_name = "band_sf_{}.{}".format(
+                variables["freq_unit"],
+                variables["figure_type"])
+        else:
+            figure_name = "band_sf_{}_{}.{}".format(
+                label,
+                variables["freq_unit"],
+                variables["figure_type"])
         return figure_name
 
     def save_figure(self, fig, figure_name):
+        # The colorbar is created first and hidden in the figure without it,
+        # so that both the figures share one layout.
+        colorbar = self.create_colorbar(fig)
+        self.create_colorbar_label(colorbar)
+        execute_layout(fig, self._dpi)
+        keep_layout(fig)
+        if self._is_rasterized(self._object_plotted):
+            # Spectral functions are drawn only once for both the figures.
+            rasterize_artist(self._object_plotted, dpi=self._dpi)
+
+        colorbar.ax.set_visible(False)
         self.save_figure_without_colorbar(fig, figure_name)
+        colorbar.ax.set_visible(True)
         self.save_figure_with_colorbar(fig, figure_name)
 
     def save_figure_without_colorbar(self, fig, figure_name):
-        fig.savefig(figure_name, dpi=288, transparent=True)
+        self._savefig(fig, figure_name)
 
     def save_figure_with_colorbar(self, fig, figure_name):
         variables = self._variables
 
-        colorbar = self.create_colorbar(fig)
-        self.create_colorbar_label(colorbar)
-
         figure_name_w_bar = figure_name.replace(
             "." + variables["figure_type"],
             "_w_bar." + variables["figure_type"])
-        fig.savefig(figure_name_w_bar, dpi=288, transparent=True)
+        self._savefig(fig, figure_name_w_bar)
+
+    def _savefig(self, fig, figure_name):
+        fig.savefig(figure_name, dpi=self._dpi, transparent=True)
 
     def create_colorbar(self, fig, cax=None, ax=None, **kwargs):
         colorbar = fig.colorbar(
@@ -252,7 +404,74 @@ class BandSFPlotter(SFPlotter):
             **kwargs)
 
 
-def interpolate_data(xs, ys, zs, n):
+def interpolate_data(xs, ys, zs, n, method="spline", nworkers=1):
+    """Interpolate `zs` given on the rectilinear grid of `xs` and `ys`
+
+    Parameters
+    ----------
+    xs, ys, zs : (nx, ny) arrays
+        `xs` may have duplicated values where paths are joined.
+    n : int
+        Number of fine intervals in each original interval.
+    method : str, optional
+        "spline" interpolates each path with bicubic splines on the grid.
+        "griddata" triangulates all the points as before.
+    nworkers : int, optional
+        Number of threads interpolating the paths for "spline".
+    """
+    if method == "griddata":
+        return _interpolate_data_griddata(xs, ys, zs, n)
+    elif method != "spline":
+        raise ValueError("Unknown interpolation method: {}".format(method))
+
+    xs_1d = xs[:, 0]
+    ys_1d = ys[0, :]
+    xs_fine_1d = create_fine_points(xs_1d, n)
+    ys_fine_1d = create_fine_points(ys_1d, n)
+
+    # Paths are interpolated separately since `zs` is discontinuous at
+    # the duplicated distances. The fine points inside a joint all sit at
+    # the end of the former path.
+    starts = np.concatenate(([0], np.where(np.diff(xs_1d) == 0.0)[0] + 1))
+    ends = np.append(starts[1:], len(xs_1d))
+
+    zs_fine = np.empty((len(xs_fine_1d), len(ys_fine_1d)))
+    segments = [
+        (xs_1d[start:end], ys_1d, zs[start:end],
+         xs_fine_1d[start * n:end * n], ys_fine_1d,
+         zs_fine[start * n:end * n])
+        for start, end in zip(starts, ends)
+    ]
+    if nworkers > 1 and len(segments) > 1:
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(min(nworkers, len(segments)))
+        try:
+            pool.map(_interpolate_segment, segments)
+        finally:
+            pool.close()
+    else:
+        for segment in segments:
+            _interpolate_segment(segment)
+
+    xs_fine, ys_fine = np.meshgrid(xs_fine_1d, ys_fine_1d, indexing="ij")
+    return xs_fine, ys_fine, zs_fine
+
+
+def _interpolate_segment(args):
+    from scipy.interpolate import RectBivariateSpline, make_interp_spline
+
+    xs, ys, zs, xs_fine, ys_fine, zs_fine = args
+    ky = min(3, len(ys) - 1)
+    if len(xs) == 1:
+        spline = make_interp_spline(ys, zs[0], k=ky)
+        zs_fine[:] = spline(ys_fine)
+    else:
+        kx = min(3, len(xs) - 1)
+        spline = RectBivariateSpline(xs, ys, zs, kx=kx, ky=ky)
+        zs_fine[:] = spline(xs_fine, ys_fine)
+
+
+def _interpolate_data_griddata(xs, ys, zs, n):
     from scipy.interpolate import griddata
 
     xs_1d = xs[:, 0]
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import io
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.colors import Normalize
+from ph_plotter.band_sf_plotter import BandSFPlotter
+from ph_plotter.colormap_creator import map_to_rgba
+
+
+__author__ = "Yuji Ikeda"
+
+
+class BandSFRasterPlotter(BandSFPlotter):
+    """Plot spectral functions resampled on the pixels as one image
+
+    Unlike "imshow", the actual distances and frequencies are respected,
+    and unlike "pcolormesh", the cost does not grow with the data beyond
+    the number of pixels.
+
+    For PNG, Matplotlib draws only the frame of the figure, and the map is
+    colored by NumPy and composited under it at the resolution saved.
+    """
+    def __init__(self, variables=None, is_horizontal=False):
+        super(BandSFRasterPlotter, self).__init__(variables, is_horizontal)
+
+        # Index maps are reused while the grid and the pixels are unchanged.
+        self._index_maps_key = None
+        self._index_maps = None
+
+    def _is_composited(self):
+        return self._variables["figure_type"] == "png"
+
+    def _plot_sf(self, ax, distances, frequencies, sf):
+        variables = self._variables
+
+        self._ax = ax
+        self._grid = (distances[:, 0], frequencies[0] * variables["unit"], sf)
+
+        x_min, x_max = ax.get_xlim()
+        y_min, y_max = ax.get_ylim()
+        if self._is_composited():
+            # Only for the colorbar; the map is composited when saved.
+            rgba = np.zeros((1, 1, 4), dtype=np.uint8)
+        else:
+            # The same resolution as the saved figure
+            dpi = self._dpi
+            fig = ax.get_figure()
+            bbox = ax.get_window_extent().transformed(
+                fig.dpi_scale_trans.inverted())
+            rgba = self._create_rgba(
+                max(int(round(bbox.width * dpi)), 1),
+                max(int(round(bbox.height * dpi)), 1))
+
+        # The colors are mapped by `map_to_rgba`. The colormap and the norm
+        # are still given for the colorbar.
+        axes_image = ax.imshow(
+            rgba,
+            cmap=self._colormap,
+            norm=Normalize(vmin=variables["sf_min"], vmax=variables["sf_max"]),
+            aspect="auto",
+            origin="lower",
+            extent=[x_min, x_max, y_min, y_max],
+            interpolation="nearest",
+        )
+        return axes_image
+
+    def _create_rgba(self, npixels_x, npixels_y):
+        """Create the RGBA image of the map with the origin at the bottom"""
+        variables = self._variables
+
+        x_min, x_max = self._ax.get_xlim()
+        y_min, y_max = self._ax.get_ylim()
+        xs, ys, sf = self._grid
+        method = variables["raster_method"]
+
+        key = (
+            len(xs), xs[0], xs[-1], len(ys), ys[0], ys[-1],
+            x_min, x_max, y_min, y_max, npixels_x, npixels_y, method)
+        if self._index_maps_key != key:
+            self._index_maps_key = key
+            self._index_maps = (
+                create_index_map(
+                    xs, create_pixel_centers(x_min, x_max, npixels_x), method),
+                create_index_map(
+                    ys, create_pixel_centers(y_min, y_max, npixels_y), method),
+            )
+        index_map_x, index_map_y = self._index_maps
+
+        image = resample(sf, index_map_x, axis=0)
+        image = resample(image, index_map_y, axis=1)
+        return map_to_rgba(
+            image.T, self._colormap, variables["sf_min"], variables["sf_max"])
+
+    def _savefig(self, fig, figure_name):
+        if not self._is_composited():
+            super(BandSFRasterPlotter, self)._savefig(fig, figure_name)
+            return
+
+        dpi = self._dpi
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="rgba", dpi=dpi, transparent=True)
+        width = int(fig.get_figwidth() * dpi)
+        image = np.frombuffer(buffer.getvalue(), dtype=np.uint8)
+        image = image.reshape(-1, width, 4).copy()
+        height = image.shape[0]
+
+        # The axes are placed by the layout done in `savefig`.
+        bbox = self._ax.get_position()
+        x0 = int(round(bbox.x0 * width))
+        x1 = int(round(bbox.x1 * width))
+        y0 = height - int(round(bbox.y1 * height))
+        y1 = height - int(round(bbox.y0 * height))
+        if x1 > x0 and y1 > y0:
+            rgba = self._create_rgba(x1 - x0, y1 - y0)[::-1]
+            image[y0:y1, x0:x1] = composite_over(image[y0:y1, x0:x1], rgba)
+        plt.imsave(figure_name, image, dpi=dpi)
+
+
+def create_pixel_centers(v_min, v_max, npixels):
+    width = (v_max - v_min) / npixels
+    return v_min + width * (np.arange(npixels) + 0.5)
+
+
+def create_index_map(points, pixels, method="nearest"):
+    """Map the pixels to the sampled points
+
+    Parameters
+    ----------
+    points : (npoints, ) array
+        Sampled points in ascending order. Duplicated points, like the
+        distances at the joints of paths, separate independent segments;
+        a pixel at or after a joint takes the data after it.
+    pixels : (npixels, ) array
+        Pixel centers.
+    method : str, optional
+        "nearest" or "linear".
+
+    Returns
+    -------
+    indices : (npixels, ) array
+        Nearest points for "nearest", or the left points of the intervals
+        including the pixels for "linear".
+    weights : (npixels, ) array or None
+        Weights of the right points for "linear".
+    is_valid : (npixels, ) array
+        False for the pixels outside the points.
+    """
+    if method not in ("nearest", "linear"):
+        raise ValueError("Unknown raster method: {}".format(method))
+
+    npoints = len(points)
+    is_valid = (points[0] <= pixels) & (pixels <= points[-1])
+    if npoints == 1:
+        return np.zeros(len(pixels), dtype=int), None, is_valid
+
+    indices = np.searchsorted(points, pixels, side="right") - 1
+    indices = np.clip(indices, 0, npoints - 2)
+    lengths = points[indices + 1] - points[indices]
+    lengths[lengths == 0.0] = np.inf
+    weights = np.clip((pixels - points[indices]) / lengths, 0.0, 1.0)
+    if method == "nearest":
+        return indices + (weights > 0.5), None, is_valid
+    return indices, weights, is_valid
+
+
+def resample(values, index_map, axis):
+    """Resample `values` along `axis` by the index map
+
+    The pixels outside the points are NaN, which are not drawn.
+    """
+    indices, weights, is_valid = index_map
+    values = np.moveaxis(values, axis, 0)
+    if weights is None:
+        resampled = values[indices]
+    else:
+        weights = weights.reshape((-1,) + (1,) * (values.ndim - 1))
+        resampled = (
+            (1.0 - weights) * values[indices] + weights * values[indices + 1])
+    resampled[~is_valid] = np.nan
+    return np.moveaxis(resampled, 0, axis)
+
+
+def composite_over(top, bottom):
+    """Composite RGBA bytes of `top` over `bottom` with straight alpha"""
+    top = top.astype(np.float32) / 255.0
+    bottom = bottom.astype(np.float32) / 255.0
+    alpha_top = top[..., 3:]
+    alpha_bottom = bottom[..., 3:] * (1.0 - alpha_top)
+    alpha = alpha_top + alpha_bottom
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rgb = np.where(
+            alpha > 0.0,
+            (top[..., :3] * alpha_top + bottom[..., :3] * alpha_bottom) / alpha,
+            0.0)
+    composited = np.concatenate((rgb, alpha), axis=-1)
+    return np.round(composited * 255.0).astype(np.uint8)
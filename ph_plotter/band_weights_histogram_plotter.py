@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import functools
+import numpy as np
+from ph_plotter.band_weights_plotter import BandWeightsPlotter
+
+
+__author__ = "Yuji Ikeda"
+
+
+class BandWeightsHistogramPlotter(BandWeightsPlotter):
+    """Plot the weights accumulated on the pixels as one image
+
+    The rendering time does not depend on the number of points. Each point
+    covers its q-point cell, or the pixel columns if the q-points are denser
+    than them, and the height of a marker or `sigma` in frequency. The color
+    shows the mean weight of the points covering each pixel, in the same
+    scale as the scatter plot.
+    """
+    def _plot_weights(self, ax, points):
+        variables = self._variables
+
+        # The same resolution as the saved figure
+        dpi = self._dpi
+        fig = ax.get_figure()
+        bbox = ax.get_window_extent().transformed(
+            fig.dpi_scale_trans.inverted())
+        nx = max(int(round(bbox.width * dpi)), 1)
+        ny = max(int(round(bbox.height * dpi)), 1)
+
+        x_min, x_max = ax.get_xlim()
+        f_min, f_max = ax.get_ylim()
+        pixel_edges = np.linspace(x_min, x_max, nx + 1)
+        x_edges = create_cell_edges(np.unique(points[:, 0]))
+        if x_edges is None or len(x_edges) > len(pixel_edges):
+            x_edges = pixel_edges
+
+        frequencies = points[:, 1] * variables["unit"]
+        bins = (x_edges, np.linspace(f_min, f_max, ny + 1))
+        weights, _, _ = np.histogram2d(
+            points[:, 0], frequencies, bins=bins, weights=points[:, 2])
+        counts, _, _ = np.histogram2d(points[:, 0], frequencies, bins=bins)
+
+        df = (f_max - f_min) / ny
+        sigma = variables["sigma"]
+        if sigma is not None:
+            from scipy.ndimage import gaussian_filter1d
+            spread = functools.partial(
+                gaussian_filter1d, sigma=sigma / df, mode="constant")
+        else:
+            # Over the diameter of a marker of the scatter plot
+            from scipy.ndimage import uniform_filter1d
+            size = max(int(round(np.sqrt(self._marker_size) / 72.0 * dpi)), 1)
+            spread = functools.partial(
+                uniform_filter1d, size=size, mode="constant")
+        weights = spread(weights, axis=1)
+        counts = spread(counts, axis=1)
+
+        # Mean weights where the points overlap, and the weight of a single
+        # point faded as spread where they are sparse. The pixels without
+        # points are left transparent.
+        impulse = np.zeros(2 * ny + 1)
+        impulse[ny] = 1.0
+        peak = np.max(spread(impulse, axis=0))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            weights = np.where(
+                counts > 0.0, weights / np.maximum(counts, peak), np.nan)
+
+        # Pixel columns take the bins containing their centers.
+        centers = 0.5 * (pixel_edges[:-1] + pixel_edges[1:])
+        ix = np.searchsorted(x_edges, centers, side="right") - 1
+        is_inside = (0 <= ix) & (ix < len(x_edges) - 1)
+        image = np.full((nx, ny), np.nan)
+        image[is_inside] = weights[ix[is_inside]]
+
+        axes_image = ax.imshow(
+            image.T,
+            cmap=self._colormap,
+            aspect="auto",
+            vmin=0.0,
+            vmax=1.0,
+            origin="lower",
+            extent=[x_min, x_max, f_min, f_max],
+            interpolation="nearest",
+        )
+        return axes_image
+
+
+def create_cell_edges(xs):
+    """Create the edges of the cells centered at the sorted unique `xs`
+
+    The edges lie at the midpoints, and the outer cells are as wide as
+    their neighbours. None is returned for less than two points.
+    """
+    if len(xs) < 2:
+        return None
+    midpoints = 0.5 * (xs[:-1] + xs[1:])
+    return np.concatenate((
+        [xs[0] - (midpoints[0] - xs[0])],
+        midpoints,
+        [xs[-1] + (xs[-1] - midpoints[-1])],
+    ))
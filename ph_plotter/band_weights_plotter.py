@@ -7,12 +7,18 @@ __author__ = "Yuji Ikeda"
 
 import numpy as np
 from matplotlib.ticker import AutoMinorLocator
-from .plotter import Plotter, read_band_labels
+from .plotter import (
+    Plotter, read_band_labels, execute_layout, keep_layout, rasterize_artist)
 from .file_io import read_band_hdf5
 from .colormap_creator import ColormapCreator
 
 
 class BandWeightsPlotter(Plotter):
+    # Resolution of the saved figures
+    _dpi = 288
+    # Area of the markers in points^2
+    _marker_size = 5.0
+
     def load_data(self, data_file="band.hdf5"):
         print("Reading band.hdf5: ", end="")
         distances, frequencies, pr_weights, nstars = read_band_hdf5(data_file)
@@ -62,34 +68,36 @@ class BandWeightsPlotter(Plotter):
 
         n_sf = 10
 
-        points = []
-        npath, nqpoint, nstar, nband = frequencies.shape
-        for ipath in range(npath):
-            for i, d in enumerate(distances[ipath]):
-                f = frequencies[ipath, i]
-                w = pr_weights[ipath, i]
-                tmp = np.stack(
-                    (np.ones((nstar, nband)) * d, f, w)
-                ).T.reshape((nstar * nband, -1))
-                points.extend(tmp)
-        points = np.array(points)
+        points = create_points(distances, frequencies, pr_weights)
+        points = cull_points(
+            points,
+            weight_min=variables["weight_min"],
+            f_range=(
+                (f_min / variables["unit"], f_max / variables["unit"])
+                if variables["is_culled"] else None),
+        )
 
         self._colormap = ColormapCreator().create_colormap_old(
             colorname=variables["colormap"],
             alpha=variables["alpha"],
             ncolor=n_sf)
+        self._quad_mesh = self._plot_weights(ax, points)
+
+    def _plot_weights(self, ax, points):
+        variables = self._variables
+
         PC = ax.scatter(
             points[:, 0],
             points[:, 1] * variables["unit"],
             c=points[:, 2],
-            s=5.0,  # size
+            s=self._marker_size,
             edgecolors="None",
             cmap=self._colormap,
             vmin=0.0,
             vmax=1.0,
             rasterized=True,
         )
-        self._quad_mesh = PC
+        return PC
 
     def create_figure_name(self):
         variables = self._variables
@@ -99,21 +107,30 @@ class BandWeightsPlotter(Plotter):
         return figure_name
 
     def save_figure(self, fig, figure_name):
+        # The colorbar is created first and hidden in the figure without it,
+        # so that both the figures share one layout.
+        colorbar = self.create_colorbar(fig)
+        execute_layout(fig, self._dpi)
+        keep_layout(fig)
+        if self._is_rasterized(self._quad_mesh):
+            # Points are drawn only once for both the figures.
+            rasterize_artist(self._quad_mesh, dpi=self._dpi)
+
+        colorbar.ax.set_visible(False)
         self.save_figure_without_colorbar(fig, figure_name)
+        colorbar.ax.set_visible(True)
         self.save_figure_with_colorbar(fig, figure_name)
 
     def save_figure_without_colorbar(self, fig, figure_name):
-        fig.savefig(figure_name, dpi=288, transparent=True)
+        fig.savefig(figure_name, dpi=self._dpi, transparent=True)
 
     def save_figure_with_colorbar(self, fig, figure_name):
         variables = self._variables
 
-        self.create_colorbar(fig)
-
         figure_name_w_bar = figure_name.replace(
             "." + variables["figure_type"],
             "_w_bar." + variables["figure_type"])
-        fig.savefig(figure_name_w_bar, dpi=288, transparent=True)
+        fig.savefig(figure_name_w_bar, dpi=self._dpi, transparent=True)
 
     def create_colorbar(self, fig, ax=None):
         variables = self._variables
@@ -125,3 +142,49 @@ class BandWeightsPlotter(Plotter):
             cb_label,
             verticalalignment="baseline",
             rotation=-90)
+        return colorbar
+
+
+def create_points(distances, frequencies, weights):
+    """Create the points of the scatter plot
+
+    Parameters
+    ----------
+    distances : (npath, nqpoint) array
+    frequencies : (npath, nqpoint, nstar, nband) array
+    weights : (npath, nqpoint, nstar, nband) array
+
+    Returns
+    -------
+    points : (npath * nqpoint * nband * nstar, 3) array
+        Distances, frequencies and weights. At each q-point the points are
+        ordered by bands and then by stars.
+    """
+    npath, nqpoint, nstar, nband = frequencies.shape
+    points = np.empty((npath, nqpoint, nband, nstar, 3))
+    points[..., 0] = distances[:, :, None, None]
+    points[..., 1] = frequencies.transpose(0, 1, 3, 2)
+    points[..., 2] = weights.transpose(0, 1, 3, 2)
+    return points.reshape(-1, 3)
+
+
+def cull_points(points, weight_min=None, f_range=None):
+    """Drop the points not visible in the plot
+
+    Parameters
+    ----------
+    points : (npoints, 3) array
+        From `create_points`.
+    weight_min : float, optional
+        Points with weights not larger than this are dropped.
+    f_range : tuple, optional
+        Points with frequencies outside `(f_min, f_max)` are dropped.
+    """
+    if weight_min is None and f_range is None:
+        return points
+    is_kept = np.ones(len(points), dtype=bool)
+    if weight_min is not None:
+        is_kept &= (points[:, 2] > weight_min)
+    if f_range is not None:
+        is_kept &= (f_range[0] <= points[:, 1]) & (points[:, 1] <= f_range[1])
+    return points[is_kept]
@@ -9,6 +9,8 @@ import h5py
 import numpy as np
 from .band_plotter import BandPlotter
 from .plotter import read_band_labels
+from .file_io import read_sf_hdf5_columns
+from .sf_data import SFData
 from ph_unfolder.irreps.irreps import extract_degeneracy_from_ir_label
 
 
@@ -22,56 +24,31 @@ class BandWidthPlotter(BandPlotter):
 
             self._is_squared = np.array(data['is_squared'])
 
-            keys = [
-                'natoms_primitive',
-                'elements',
-                'distance',
-                'pointgroup_symbol',
-                'num_irreps',
-                'ir_labels',
-            ]
-            data_points = []
-            distances = []
-            frequencies = []
-            widths = []
-            for ipath in range(npaths):
-                distances_on_path = []
-                frequencies_on_path = []
-                widths_on_path = []
-                for ip in range(npoints):
-                    group = '{}/{}/'.format(ipath, ip)
-                    data_points.append(
-                        {k: np.array(data[group + k]) for k in keys}
-                    )
-
-                    distances_on_path.append(np.array(data[group + 'distance']))
-
-                    indices_nonzero = np.where(np.isfinite(data[group + 'norms_s']))
-                    ir_labels = np.array(data[group + 'ir_labels'])
-
-                    frequencies_on_point = []
-                    widths_on_point = []
-                    for index in indices_nonzero[0]:
-                        degeneracy = extract_degeneracy_from_ir_label(ir_labels[index])
-                        for i in range(degeneracy):
-                            frequencies_on_point.append(np.array(data[group + 'peaks_s' ])[index])
-                            widths_on_point     .append(np.array(data[group + 'widths_s'])[index])
-
-                    indices_sort = np.argsort(frequencies_on_point)
-
-                    frequencies_on_path.append(np.array(frequencies_on_point)[indices_sort])
-                    widths_on_path     .append(np.array(widths_on_point     )[indices_sort])
-
-                distances.append(distances_on_path)
-                frequencies.append(frequencies_on_path)
-                widths.append(widths_on_path)
+        keys = [
+            'natoms_primitive',
+            'elements',
+            'distance',
+            'pointgroup_symbol',
+            'num_irreps',
+            'ir_labels',
+        ]
+        columns = read_sf_hdf5_columns(
+            data_file, keys + ['peaks_s', 'widths_s', 'norms_s'],
+            nworkers=self._variables['load_workers'])
+        frequencies, widths = expand_peaks(
+            columns['peaks_s'],
+            columns['widths_s'],
+            columns['norms_s'],
+            columns['ir_labels'],
+        )
         print("Finished")
 
-        distances   = np.array(distances)
-        frequencies = np.array(frequencies)
-        widths      = np.array(widths)
+        distances   = columns['distance'].reshape(npaths, npoints)
+        frequencies = frequencies.reshape(npaths, npoints, -1)
+        widths      = widths.reshape(npaths, npoints, -1)
 
-        self._data_points = data_points
+        self._data_points = SFData(
+            {k: columns[k] for k in keys}, npaths * npoints)
 
         self._distances = distances / distances[-1, -1]
         self._frequencies = frequencies
@@ -91,14 +68,17 @@ class BandWidthPlotter(BandPlotter):
 
         npath, nqpoint, nband = frequencies.shape
         for ipath in range(npath):
+            bands = self.find_visible_bands(
+                frequencies[ipath] - bandwidths[ipath],
+                frequencies[ipath] + bandwidths[ipath])
             lines = ax.plot(
                 distances[ipath],
-                frequencies[ipath] * variables["unit"],
+                frequencies[ipath][:, bands] * variables["unit"],
                 variables["linecolor"],
                 dashes=variables["dashes"],
                 linewidth=variables["linewidth"],
             )
-            for ib in range(nband):
+            for ib in bands:
                 ax.fill_between(
                     distances[ipath],
                     (frequencies[ipath, :, ib] + bandwidths[ipath, :, ib]) * variables["unit"],
@@ -137,3 +117,40 @@ class BandWidthPlotter(BandPlotter):
             variables["freq_unit"],
             variables["figure_type"])
         return figure_name
+
+
+def expand_peaks(peaks, widths, norms, ir_labels):
+    """Expand fitted peaks by the degeneracies of the irreps
+
+    Parameters
+    ----------
+    peaks, widths, norms : (nq, nirreps) arrays
+        Irreps with non-finite norms are ignored.
+    ir_labels : (nq, nirreps) array
+        Empty labels mark padding and are ignored.
+
+    Returns
+    -------
+    frequencies, widths : (nq, nband) arrays
+        Sorted by frequency at each q-point.
+    """
+    is_valid = np.isfinite(norms) & (ir_labels != ir_labels.dtype.type())
+
+    labels_unique, inverse = np.unique(ir_labels[is_valid], return_inverse=True)
+    degeneracies_unique = np.array(
+        [extract_degeneracy_from_ir_label(x) for x in labels_unique], dtype=int)
+    degeneracies = np.zeros(ir_labels.shape, dtype=int)
+    degeneracies[is_valid] = degeneracies_unique[inverse]
+
+    nbands = np.sum(degeneracies, axis=1)
+    if np.any(nbands != nbands[0]):
+        raise ValueError("Numbers of bands differ among q-points.")
+
+    nq = len(peaks)
+    frequencies = np.repeat(peaks.ravel(), degeneracies.ravel()).reshape(nq, -1)
+    widths = np.repeat(widths.ravel(), degeneracies.ravel()).reshape(nq, -1)
+
+    indices_sort = np.argsort(frequencies, axis=1)
+    frequencies = np.take_along_axis(frequencies, indices_sort, axis=1)
+    widths = np.take_along_axis(widths, indices_sort, axis=1)
+    return frequencies, widths
@@ -39,6 +39,58 @@ def convert_white_to_transparent(color_list):
     return color_list
 
 
+def create_lut(cmap):
+    """Create the lookup table of `cmap` for `map_to_rgba`
+
+    Returns
+    -------
+    lut : (cmap.N + 3, 4) array of uint8
+        The N colors followed by the "under", "over" and "bad" colors.
+    """
+    indices = np.append(np.arange(cmap.N), [-1, cmap.N])
+    return np.vstack((cmap(indices, bytes=True), cmap(np.nan, bytes=True)))
+
+
+def map_to_rgba(values, cmap, vmin, vmax, lut=None):
+    """Map `values` to RGBA bytes with NumPy indexing
+
+    This gives the same as `cmap(Normalize(vmin, vmax)(values), bytes=True)`
+    without masked arrays.
+
+    Parameters
+    ----------
+    values : array
+    cmap : Colormap
+    vmin, vmax : float
+    lut : array, optional
+        From `create_lut(cmap)`.
+
+    Returns
+    -------
+    rgba : values.shape + (4, ) array of uint8
+    """
+    if lut is None:
+        lut = create_lut(cmap)
+    n = cmap.N
+    values = np.asarray(values, dtype=float)
+    if vmin == vmax:
+        x = np.zeros_like(values)
+    else:
+        x = (values - vmin) / (vmax - vmin)
+    x *= n
+    with np.errstate(invalid="ignore"):
+        x[x == n] = n - 1
+        np.clip(x, -1, n, out=x)
+        indices = x.astype(np.intp)
+        indices[x < 0] = n  # under
+        indices[x >= n] = n + 1  # over
+    indices[np.isnan(x)] = n + 2  # bad
+
+    # One 32-bit word per color is taken at once.
+    lut = np.ascontiguousarray(lut, dtype=np.uint8).view(np.uint32).ravel()
+    return lut.take(indices).view(np.uint8).reshape(values.shape + (4, ))
+
+
 class ColormapCreator(object):
     def __init__(self, color_p='r', color_n='w', alpha=1.0, is_transparent_gradient=False):
         if isinstance(color_p, basestring):
@@ -69,3 +69,7 @@ class CommonArgumentsAdder(object):
                             default="POSCAR",
                             type=str,
                             help="Filename of POSCAR.")
+        parser.add_argument("--no_cache", dest="is_cached",
+                            action="store_false",
+                            help=("Do not use the binary cache of band.yaml "
+                                  "and text data files."))
@@ -2,10 +2,12 @@
 # -*- coding: utf-8 -*-
 from __future__ import (absolute_import, division,
                         print_function, unicode_literals)
+import functools
 import numpy as np
 from matplotlib.ticker import AutoMinorLocator
-from matplotlib.backends.backend_pdf import PdfPages
 from .plotter import Plotter
+from .file_io import read_text_columns, iter_text_blocks
+from .page_renderer import render_pages
 
 
 __author__ = "Yuji Ikeda"
@@ -20,12 +22,55 @@ class DOSPlotter(Plotter):
         self._plot_total = True
 
     def load_data(self, data_file):
-        data = np.loadtxt(data_file).T
+        if self._is_symbols and not self._plot_atom:
+            return self.load_data_reduced(data_file)
+        data = read_text_columns(
+            data_file, is_cached=self._variables['is_cached'])
         print(np.sum(data[1]))
         self._frequencies = data[0]
         self._dos_list = data[1:]
+        self._dos_total = None
+        self._dos_symbols = None
         return self
 
+    def load_data_reduced(self, data_file):
+        """Load only the total and the symbol DOS
+
+        The file is streamed block by block and the atom columns are summed
+        on the fly, so the DOS of each atom is never kept.
+        """
+        reduced_symbols = None
+        frequencies = []
+        dos_reduced = []
+        for block in iter_text_blocks(data_file):
+            if reduced_symbols is None:
+                reduced_symbols, grouping = create_grouping_matrix(
+                    self._find_symbols(), block.shape[1] - 1)
+            frequencies.append(block[:, 0])
+            dos_reduced.append(grouping.dot(block[:, 1:].T))
+
+        self._frequencies = np.concatenate(frequencies)
+        self._dos_list = None
+        self._set_dos_reduced(
+            reduced_symbols, np.concatenate(dos_reduced, axis=1))
+        return self
+
+    def _reduce_dos_list(self):
+        """Sum the DOS of atoms for all the symbols and in total at once"""
+        reduced_symbols, grouping = create_grouping_matrix(
+            self._find_symbols(), len(self._dos_list))
+        self._set_dos_reduced(reduced_symbols, grouping.dot(self._dos_list))
+
+    def _find_symbols(self):
+        symbols = self._variables.get("symbols")
+        if symbols is None:
+            symbols = []
+        return symbols
+
+    def _set_dos_reduced(self, reduced_symbols, dos_reduced):
+        self._dos_total = dos_reduced[-1]
+        self._dos_symbols = dict(zip(reduced_symbols, dos_reduced[:-1]))
+
     def plot(self, ax):
         if self._plot_total:
             figure_name = self.create_figure_name()
@@ -105,10 +150,11 @@ class DOSPlotter(Plotter):
     def plot_dos_total(self, ax):
         variables = self._variables
 
+        window = self.find_frequency_window(self._frequencies)
         dos_total = self.create_dos_total()
         lines = ax.plot(
-            dos_total / (variables["unit"] * variables["natoms"] * 3),
-            self._frequencies * variables["unit"],
+            dos_total[window] / (variables["unit"] * variables["natoms"] * 3),
+            self._frequencies[window] * variables["unit"],
             variables["linecolor"],
             dashes=variables["dashes"],
             linewidth=variables["linewidth"],
@@ -124,17 +170,14 @@ class DOSPlotter(Plotter):
         pass
 
     def create_dos_total(self):
-        dos_total = np.sum(self._dos_list, axis=0)
-        return dos_total
+        if self._dos_total is None:
+            self._reduce_dos_list()
+        return self._dos_total
 
     def create_dos_symbol(self, s):
-        variables = self._variables
-
-        indices = [i for i, x in enumerate(variables["symbols"]) if x == s]
-        print(s, indices)
-        dos_symbol = np.sum(self._dos_list[indices], axis=0)
-
-        return dos_symbol
+        if self._dos_symbols is None:
+            self._reduce_dos_list()
+        return self._dos_symbols[s]
 
     def print_dos_symbols(self):
         variables = self._variables
@@ -181,10 +224,11 @@ class DOSPlotter(Plotter):
     def plot_dos_symbol(self, ax, s):
         variables = self._variables
 
+        window = self.find_frequency_window(self._frequencies)
         dos_symbol = self.create_dos_symbol(s)
         lines = ax.plot(
-            dos_symbol / (variables["unit"] * variables["natoms"] * 3),
-            self._frequencies * variables["unit"],
+            dos_symbol[window] / (variables["unit"] * variables["natoms"] * 3),
+            self._frequencies[window] * variables["unit"],
             variables["linecolor"],
             dashes=variables["dashes"],
             linewidth=variables["linewidth"],
@@ -192,18 +236,57 @@ class DOSPlotter(Plotter):
         return lines
 
     def plot_dos_atom(self, ax):
+        figure_name = self.create_figure_name(is_atom=True)
+        render_pages(
+            figure_name,
+            functools.partial(self._render_pages_dos_atom, ax),
+            range(len(self._dos_list)),
+            nworkers=self._variables["page_workers"])
+
+    def _render_pages_dos_atom(self, ax, pdf, indices):
         variables = self._variables
 
-        figure_name = self.create_figure_name(is_atom=True)
-        with PdfPages(figure_name) as pdf:
-            for i, dos_atom in enumerate(self._dos_list):
-                print(i)
-                lines = ax.plot(
-                    dos_atom / (variables["unit"] * variables["natoms"] * 3),
-                    self._frequencies * variables["unit"],
-                    variables["linecolor"],
-                    dashes=variables["dashes"],
-                    linewidth=variables["linewidth"],
-                )
-                pdf.savefig(transparent=True)
-                lines[0].remove()
+        window = self.find_frequency_window(self._frequencies)
+        for i in indices:
+            print(i)
+            lines = ax.plot(
+                self._dos_list[i][window] / (variables["unit"] * variables["natoms"] * 3),
+                self._frequencies[window] * variables["unit"],
+                variables["linecolor"],
+                dashes=variables["dashes"],
+                linewidth=variables["linewidth"],
+            )
+            pdf.savefig(transparent=True)
+            lines[0].remove()
+
+
+def create_grouping_matrix(symbols, natoms):
+    """Create the sparse matrix summing the DOS of atoms
+
+    Parameters
+    ----------
+    symbols : list
+        Symbols of the atoms, e.g., ['Cu', 'Cu', 'Au', 'Au'].
+    natoms : int
+        Number of the DOS of atoms. Atoms beyond `symbols` count only in
+        the total.
+
+    Returns
+    -------
+    reduced_symbols : list
+        Symbols in the order of the first appearance.
+    grouping : (len(reduced_symbols) + 1, natoms) scipy.sparse.csr_matrix
+        The rows are for `reduced_symbols` and the last row is for the total.
+    """
+    from scipy.sparse import csr_matrix
+
+    symbols = list(symbols)
+    reduced_symbols = sorted(set(symbols), key=symbols.index)
+    rows = [reduced_symbols.index(x) for x in symbols[:natoms]]
+    columns = list(range(len(rows)))
+    rows += [len(reduced_symbols)] * natoms
+    columns += list(range(natoms))
+    grouping = csr_matrix(
+        (np.ones(len(rows)), (rows, columns)),
+        shape=(len(reduced_symbols) + 1, natoms))
+    return reduced_symbols, grouping
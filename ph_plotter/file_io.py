@@ -5,29 +5,292 @@ from __future__ import (absolute_import, division,
 
 __author__ = "Yuji Ikeda"
 
+import os
+import hashlib
+import itertools
+import tempfile
+import warnings
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
 import numpy as np
 
 
 def read_band_yaml(yaml_file="band.yaml"):
+    """Read distances and frequencies from a phonopy band.yaml
+
+    The file is scanned line by line and only the "distance" and
+    "frequency" entries are parsed into preallocated arrays, so eigenvector
+    blocks cost no more than skipping their lines. Files which do not follow
+    the phonopy layout fall back to a full YAML parse.
+
+    Returns
+    -------
+    distance : (npath, nsep) array
+    frequency : (npath, nsep, nband) array
+    """
+    try:
+        return _read_band_yaml_stream(yaml_file)
+    except ValueError:
+        return _read_band_yaml_full(yaml_file)
+
+
+def _read_band_yaml_stream(yaml_file):
+    header = {}
+    with open(yaml_file, "r") as f:
+        for line in f:
+            if line.startswith("phonon:"):
+                break
+            key, _, value = line.partition(":")
+            if key in ("nqpoint", "npath", "natom"):
+                header[key] = int(value)
+        else:
+            raise ValueError("No phonon entries in {}".format(yaml_file))
+
+        if len(header) != 3:
+            raise ValueError("Incomplete header in {}".format(yaml_file))
+        nqpoint = header["nqpoint"]
+        nband = header["natom"] * 3
+
+        distance = np.empty(nqpoint)
+        frequency = np.empty((nqpoint, nband))
+        iq = -1
+        ib = nband
+        has_distance = True
+        try:
+            for line in f:
+                # Eigenvector lines do not contain any colon.
+                if ":" not in line:
+                    continue
+                line = line.lstrip()
+                if line.startswith("- q-position:"):
+                    # Every entry of the previous q-point must be filled.
+                    if ib != nband or not has_distance:
+                        raise ValueError(
+                            "Incomplete q-point in {}".format(yaml_file))
+                    iq += 1
+                    ib = 0
+                    has_distance = False
+                elif iq < 0:
+                    # Index -1 would silently write into the last q-point.
+                    if line.startswith(("frequency:", "distance:")):
+                        raise ValueError(
+                            "Entry before the first q-point in {}".format(
+                                yaml_file))
+                elif line.startswith("frequency:"):
+                    frequency[iq, ib] = float(line[10:])
+                    ib += 1
+                elif line.startswith("distance:"):
+                    distance[iq] = float(line[9:])
+                    has_distance = True
+        except IndexError:
+            raise ValueError("Inconsistent shape in {}".format(yaml_file))
+
+    if iq != nqpoint - 1 or ib != nband or not has_distance:
+        raise ValueError("Inconsistent shape in {}".format(yaml_file))
+
+    return _reshape_band(distance, frequency, header["npath"])
+
+
+def _read_band_yaml_full(yaml_file):
     import yaml
-    data = yaml.load(open(yaml_file, "r"))
-    nqpoint = data['nqpoint']
-    npath = data['npath']
-    natom = data['natom']
-    nband = natom * 3
-    nsep = nqpoint // npath
-    distance = np.zeros((npath, nsep))
-    frequency = np.zeros((npath, nsep, nband))
-    for ipath in range(npath):
-        for isep in range(nsep):
-            iq = ipath * nsep + isep
-            distance[ipath, isep] = data['phonon'][iq]['distance']
-            for iband in range(nband):
-                frequency[ipath, isep, iband] = (
-                    data['phonon'][iq]['band'][iband]['frequency'])
+    try:
+        from yaml import CSafeLoader as Loader
+    except ImportError:
+        from yaml import SafeLoader as Loader
+    with open(yaml_file, "r") as f:
+        data = yaml.load(f, Loader=Loader)
+    nband = data['natom'] * 3
+    phonon = data['phonon']
+    distance = np.array([point['distance'] for point in phonon])
+    frequency = np.array(
+        [[band['frequency'] for band in point['band'][:nband]]
+         for point in phonon])
+    return _reshape_band(distance, frequency, data['npath'])
+
+
+def _reshape_band(distance, frequency, npath):
+    nsep = len(distance) // npath
+    nq = npath * nsep
+    distance = distance[:nq].reshape(npath, nsep)
+    frequency = frequency[:nq].reshape(npath, nsep, -1)
     return distance, frequency
 
 
+def read_band_yaml_cached(yaml_file="band.yaml"):
+    """Same as read_band_yaml but through the binary sidecar cache"""
+    return load_cached(
+        yaml_file, read_band_yaml, ("distance", "frequency"))
+
+
+def load_cached(filename, read, names):
+    """Return the arrays parsed from `filename` via a binary sidecar cache
+
+    The arrays are stored as ".{basename}.npz" next to `filename` together
+    with their names and the size, the mtime and the SHA-1 hash of the
+    source. The cache is used when the names, the size and the mtime match;
+    when only the mtime differs, the hash decides whether the source really
+    changed. Otherwise the cache is rebuilt.
+
+    Parameters
+    ----------
+    filename : str
+        Source file.
+    read : callable
+        `read(filename)` returns the tuple of arrays to be cached.
+    names : tuple of str
+        Names of the arrays returned by `read`.
+    """
+    dirname, basename = os.path.split(filename)
+    cache_file = os.path.join(dirname, "." + basename + ".npz")
+
+    stat = os.stat(filename)
+    key = _load_cache_key(cache_file)
+    if (key is not None and key["size"] == stat.st_size and
+            key["names"] == list(names)):
+        if key["mtime"] == stat.st_mtime:
+            return _load_cache_arrays(cache_file, names)
+        sha1 = _calculate_sha1(filename)
+        if key["sha1"] == sha1:
+            arrays = _load_cache_arrays(cache_file, names)
+            _save_cache(cache_file, names, arrays, stat, sha1)
+            return arrays
+
+    arrays = read(filename)
+    _save_cache(cache_file, names, arrays, stat, _calculate_sha1(filename))
+    return arrays
+
+
+def _load_cache_key(cache_file):
+    if not os.path.isfile(cache_file):
+        return None
+    try:
+        with np.load(cache_file) as data:
+            return {
+                "size": int(data["_size"]),
+                "mtime": float(data["_mtime"]),
+                "sha1": str(data["_sha1"]),
+                "names": [str(x) for x in data["_names"]],
+            }
+    except (IOError, OSError, ValueError, KeyError):
+        return None
+
+
+def _load_cache_arrays(cache_file, names):
+    with np.load(cache_file) as data:
+        return tuple(data[name] for name in names)
+
+
+def _save_cache(cache_file, names, arrays, stat, sha1):
+    data = dict(zip(names, arrays))
+    data["_size"] = stat.st_size
+    data["_mtime"] = stat.st_mtime
+    data["_sha1"] = sha1
+    data["_names"] = np.array(names)
+    # A unique temporary file keeps concurrent runs from replacing the
+    # cache with a file still written by another run.
+    tmp_file = None
+    try:
+        fd, tmp_file = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(cache_file)),
+            suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **data)
+        _replace_file(tmp_file, cache_file)
+    except (IOError, OSError) as e:
+        warnings.warn("Cache {} not written: {}".format(cache_file, e))
+        if tmp_file is not None and os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+
+def _replace_file(src, dst):
+    if hasattr(os, "replace"):
+        os.replace(src, dst)
+        return
+    # Python 2 cannot rename over an existing file on Windows.
+    if os.path.exists(dst):
+        os.remove(dst)
+    os.rename(src, dst)
+
+
+def _calculate_sha1(filename, blocksize=2 ** 20):
+    sha1 = hashlib.sha1()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(blocksize), b""):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def read_text_columns(filename, usecols=None, is_cached=False):
+    """Read a whitespace-separated text file column by column
+
+    Same as `np.loadtxt(filename, usecols=usecols, ndmin=2).T`, which it
+    calls on NumPy >= 1.23. Older NumPy parses the lines in Python, so
+    there the blocks of `iter_text_blocks` are parsed instead.
+
+    If `is_cached`, only the columns of `usecols` (all by default) are kept
+    in the binary sidecar cache of `load_cached`. Reading other columns
+    rebuilds the cache.
+
+    Returns
+    -------
+    columns : (ncols, nrows) array
+    """
+    if not is_cached:
+        return _read_text_array(filename, usecols).T
+    if usecols is None:
+        name = "data"
+    else:
+        name = "data_" + "_".join(str(i) for i in np.atleast_1d(usecols))
+    data, = load_cached(
+        filename, lambda x: (_read_text_array(x, usecols),), (name,))
+    return data.T
+
+
+def _read_text_array(filename, usecols=None):
+    if _IS_LOADTXT_FAST:
+        return np.loadtxt(filename, usecols=usecols, ndmin=2)
+    blocks = list(iter_text_blocks(filename, usecols))
+    if not blocks:
+        raise ValueError("No data in {}".format(filename))
+    return np.vstack(blocks)
+
+
+def iter_text_blocks(filename, usecols=None, nrows=2 ** 16):
+    """Yield the rows of a whitespace-separated text file in blocks
+
+    Lines starting with "#" and blank lines are skipped.
+
+    Returns
+    -------
+    Iterator of (nrows_block, ncols) arrays.
+    """
+    with open(filename, "r") as f:
+        while True:
+            lines = list(itertools.islice(f, nrows))
+            if not lines:
+                break
+            lines = [l for l in lines
+                     if l.strip() and not l.lstrip().startswith("#")]
+            if lines:
+                yield _parse_text_lines(lines, usecols)
+
+
+# np.loadtxt parses text in C since NumPy 1.23; older versions parse
+# line by line in Python, which is much slower than np.fromstring.
+_IS_LOADTXT_FAST = np.lib.NumpyVersion(np.__version__) >= "1.23.0"
+
+
+def _parse_text_lines(lines, usecols):
+    if _IS_LOADTXT_FAST:
+        return np.loadtxt(lines, usecols=usecols, ndmin=2)
+    data = np.fromstring("".join(lines), sep=" ").reshape(len(lines), -1)
+    if usecols is not None:
+        data = data[:, np.atleast_1d(usecols)]
+    return data
+
+
 def read_band_hdf5(hdf5_file="band.hdf5"):
     import h5py
     with h5py.File(hdf5_file, "r") as f:
@@ -45,10 +308,280 @@ def read_band_hdf5(hdf5_file="band.hdf5"):
 
     return distances, frequencies, pr_weights, nqstars
 
-def read_band_hdf5_dict(hdf5_file="band.hdf5"):
+def read_band_hdf5_dict(hdf5_file="band.hdf5", is_lazy=False):
+    """Read all the datasets in band.hdf5
+
+    If `is_lazy`, a `LazyHDF5Dict` is returned instead of a dict, and each
+    dataset is loaded only when accessed.
+    """
+    if is_lazy:
+        return LazyHDF5Dict(hdf5_file)
     import h5py
     data = {}
     with h5py.File(hdf5_file, "r") as f:
         for k, v in f.items():
             data[k] = np.array(v)
     return data
+
+
+class LazyHDF5Dict(Mapping):
+    """Read-only dict of the datasets in an HDF5 file loaded on first access
+
+    The file is kept open until `close` is called, which also releases the
+    loaded arrays. `read_slice` reads a hyperslab without loading the whole
+    dataset.
+    """
+    def __init__(self, hdf5_file):
+        import h5py
+        self._file = h5py.File(hdf5_file, "r")
+        self._data = {}
+
+    def __getitem__(self, key):
+        if key not in self._data:
+            self._data[key] = np.array(self._file[key])
+        return self._data[key]
+
+    def __contains__(self, key):
+        return key in self._file
+
+    def __iter__(self):
+        return iter(self._file.keys())
+
+    def __len__(self):
+        return len(self._file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def read_slice(self, key, index):
+        """Return `self[key][index]` reading only the selected elements
+
+        The selection is not kept, and the dataset is not loaded unless it
+        has been accessed as a whole before.
+        """
+        if key in self._data:
+            return self._data[key][index]
+        return self._file[key][index]
+
+    def close(self):
+        self._data.clear()
+        self._file.close()
+
+
+def read_sf_hdf5(hdf5_file="sf.hdf5", keys=None, nworkers=1):
+    """Read sf.hdf5 with each key stacked over all the q-points
+
+    Both the original layout with one group per q-point ("{ipath}/{ip}/")
+    and the columnar layout written by `write_sf_hdf5_columnar` are
+    supported. In the latter, each key is read with a single call.
+
+    Parameters
+    ----------
+    keys : list of str, optional
+        Keys to be read. Keys absent from the file are skipped. By default
+        every key found for the q-points is read.
+    nworkers : int, optional
+        Number of processes reading the paths of the original layout
+        concurrently.
+
+    Returns
+    -------
+    paths : ndarray
+    frequencies : ndarray
+    is_squared : ndarray
+    columns : dict
+        Arrays of shape (npaths * npoints, ...) for each key.
+    """
+    import h5py
+    with h5py.File(hdf5_file, "r") as f:
+        paths = np.array(f["paths"])
+        frequencies = np.array(f["frequencies"])
+        is_squared = np.array(f["is_squared"])
+    columns = read_sf_hdf5_columns(hdf5_file, keys, nworkers)
+    return paths, frequencies, is_squared, columns
+
+
+def read_sf_hdf5_columns(hdf5_file="sf.hdf5", keys=None, nworkers=1):
+    """Read only the stacked columns for `keys` from sf.hdf5"""
+    import h5py
+    with h5py.File(hdf5_file, "r") as f:
+        if "columns" in f or nworkers is None or nworkers <= 1:
+            return _read_sf_hdf5_columns(f, keys)
+        npaths = f["paths"].shape[0]
+        keys = _find_sf_hdf5_group_keys(f, keys)
+
+    # Each path is read by an independent process; h5py serializes the
+    # calls from threads within one process.
+    import multiprocessing
+    pool = multiprocessing.Pool(min(nworkers, npaths))
+    try:
+        values_paths = pool.map(
+            _read_sf_hdf5_path,
+            [(hdf5_file, ipath, keys) for ipath in range(npaths)])
+    finally:
+        pool.close()
+        pool.join()
+    return {k: stack_padded([v for values in values_paths for v in values[k]])
+            for k in keys}
+
+
+def _read_sf_hdf5_path(args):
+    import h5py
+    hdf5_file, ipath, keys = args
+    with h5py.File(hdf5_file, "r") as f:
+        npoints = f["paths"].shape[1]
+        values = {k: [] for k in keys}
+        for ip in range(npoints):
+            group = f["{}/{}".format(ipath, ip)]
+            for k in keys:
+                values[k].append(group[k][()])
+    return values
+
+
+def find_sf_hdf5_keys(hdf5_file="sf.hdf5"):
+    """Return the keys stored for the q-points in sf.hdf5"""
+    import h5py
+    with h5py.File(hdf5_file, "r") as f:
+        if "columns" in f:
+            return list(f["columns"].keys())
+        return _find_sf_hdf5_group_keys(f, None)
+
+
+def iter_sf_hdf5_column_chunks(hdf5_file, key, max_nbytes):
+    """Yield `(start, end, values)` for consecutive q-point chunks of `key`
+
+    The file is kept open during the iteration and each chunk holds at most
+    `max_nbytes` bytes (but at least one q-point), so the whole column never
+    has to be in memory.
+    """
+    import h5py
+    with h5py.File(hdf5_file, "r") as f:
+        if "columns" in f:
+            dataset = f["columns"][key]
+            nq = dataset.shape[0]
+            nrows = _find_chunk_nrows(
+                dataset.shape[1:], dataset.dtype, max_nbytes)
+            for start in range(0, nq, nrows):
+                end = min(start + nrows, nq)
+                yield start, end, dataset[start:end]
+        else:
+            npaths, npoints = f["paths"].shape[:2]
+            nq = npaths * npoints
+            first = f["0/0"][key]
+            nrows = _find_chunk_nrows(first.shape, first.dtype, max_nbytes)
+            for start in range(0, nq, nrows):
+                end = min(start + nrows, nq)
+                values = [f["{}/{}/{}".format(iq // npoints, iq % npoints, key)][()]
+                          for iq in range(start, end)]
+                yield start, end, stack_padded(values)
+
+
+def _find_chunk_nrows(shape, dtype, max_nbytes):
+    row_nbytes = int(np.prod(shape)) * dtype.itemsize
+    return max(int(max_nbytes // max(row_nbytes, 1)), 1)
+
+
+def _read_sf_hdf5_columns(f, keys):
+    if "columns" in f:
+        group = f["columns"]
+        if keys is None:
+            keys = list(group.keys())
+        return {k: group[k][()] for k in keys if k in group}
+    npaths, npoints = f["paths"].shape[:2]
+    return _read_sf_hdf5_groups(f, npaths, npoints, keys)
+
+
+def _read_sf_hdf5_groups(f, npaths, npoints, keys):
+    keys = _find_sf_hdf5_group_keys(f, keys)
+    values = {k: [] for k in keys}
+    for ipath in range(npaths):
+        for ip in range(npoints):
+            group = f["{}/{}".format(ipath, ip)]
+            for k in keys:
+                values[k].append(group[k][()])
+    return {k: stack_padded(v) for k, v in values.items()}
+
+
+def _find_sf_hdf5_group_keys(f, keys):
+    first = f["0/0"]
+    if keys is None:
+        return list(first.keys())
+    return [k for k in keys if k in first]
+
+
+def write_sf_hdf5_columnar(hdf5_file, hdf5_file_columnar, chunk_nbytes=2 ** 22):
+    """Repack sf.hdf5 so that each key is one dataset chunked along q
+
+    The q-points are copied one after another so that the full data never
+    has to be held in memory.
+
+    Parameters
+    ----------
+    chunk_nbytes : int
+        Approximate size of the HDF5 chunks in bytes.
+    """
+    import h5py
+    with h5py.File(hdf5_file, "r") as fin, \
+            h5py.File(hdf5_file_columnar, "w") as fout:
+        for k, v in fin.items():
+            if isinstance(v, h5py.Dataset):
+                fout.create_dataset(k, data=v[()])
+
+        npaths, npoints = fin["paths"].shape[:2]
+        nq = npaths * npoints
+        groups = [fin["{}/{}".format(ipath, ip)]
+                  for ipath in range(npaths) for ip in range(npoints)]
+        keys = _find_sf_hdf5_group_keys(fin, None)
+
+        # Shapes may differ among q-points; the columns are zero-padded.
+        shapes = {}
+        dtypes = {}
+        for k in keys:
+            shapes[k] = np.max([g[k].shape for g in groups], axis=0).astype(int)
+            dtypes[k] = np.result_type(
+                *[_find_storable_dtype(g[k].dtype) for g in groups])
+
+        columns = fout.create_group("columns")
+        for k in keys:
+            shape = tuple(shapes[k])
+            row_nbytes = max(int(np.prod(shape)) * dtypes[k].itemsize, 1)
+            nrows = min(max(chunk_nbytes // row_nbytes, 1), nq)
+            dataset = columns.create_dataset(
+                k, shape=(nq,) + shape, dtype=dtypes[k],
+                chunks=(nrows,) + shape if shape else (nrows,))
+            buffer = np.zeros((nrows,) + shape, dtype=dtypes[k])
+            for start in range(0, nq, nrows):
+                end = min(start + nrows, nq)
+                buffer[...] = np.zeros((), dtype=dtypes[k])
+                for i, g in enumerate(groups[start:end]):
+                    value = np.asarray(g[k][()]).astype(dtypes[k])
+                    buffer[(i,) + tuple(slice(n) for n in value.shape)] = value
+                dataset[start:end] = buffer[:end - start]
+
+
+def _find_storable_dtype(dtype):
+    # Variable-length strings are stored as fixed-length bytes.
+    if dtype.kind == "O":
+        return np.dtype("S64")
+    return dtype
+
+
+def stack_padded(values):
+    """Stack arrays along a new first axis, zero-padding different shapes
+
+    As in `write_sf_hdf5_columnar`, variable-length strings are padded as
+    fixed-length bytes with b"", not with the integer 0.
+    """
+    values = [np.asarray(v) for v in values]
+    shapes = set(v.shape for v in values)
+    if len(shapes) == 1:
+        return np.array(values)
+    shape = tuple(np.max(list(shapes), axis=0))
+    dtype = np.result_type(*[_find_storable_dtype(v.dtype) for v in values])
+    stacked = np.zeros((len(values),) + shape, dtype=dtype)
+    for i, v in enumerate(values):
+        stacked[(i,) + tuple(slice(n) for n in v.shape)] = v
+    return stacked
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import os
+import shutil
+import tempfile
+import warnings
+import numpy as np
+from matplotlib.backends.backend_pdf import PdfPages
+
+
+__author__ = "Yuji Ikeda"
+
+
+def render_pages(figure_name, render, indices, nworkers=1):
+    """Render the pages of the multipage PDF `figure_name`
+
+    Parameters
+    ----------
+    figure_name : str
+    render : callable
+        `render(pdf, indices)` saves the pages for `indices` in order to
+        `pdf`, a PdfPages object.
+    indices : list
+    nworkers : int, optional
+        Number of processes. Contiguous shards of `indices` are rendered
+        into partial PDFs by forked processes, which inherit the figure and
+        the data, and the partial PDFs are merged in order. This needs the
+        "fork" start method and pypdf; otherwise the pages are rendered by
+        this process.
+    """
+    indices = list(indices)
+    if nworkers is None:
+        nworkers = 1
+    nworkers = min(nworkers, len(indices))
+    if nworkers > 1 and not _is_parallel_available():
+        nworkers = 1
+
+    if nworkers <= 1:
+        with PdfPages(figure_name) as pdf:
+            render(pdf, indices)
+        return
+
+    import multiprocessing
+    context = multiprocessing.get_context("fork")
+
+    shards = [shard.tolist() for shard in np.array_split(indices, nworkers)]
+    tmpdir = tempfile.mkdtemp(
+        dir=os.path.dirname(os.path.abspath(figure_name)))
+    try:
+        part_names = [
+            os.path.join(tmpdir, "{}.pdf".format(i))
+            for i in range(len(shards))]
+        processes = [
+            context.Process(target=_render_shard, args=(render, shard, name))
+            for shard, name in zip(shards, part_names)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        if any(process.exitcode != 0 for process in processes):
+            raise RuntimeError("Rendering pages failed in a worker.")
+        merge_pdfs(part_names, figure_name)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def _is_parallel_available():
+    import multiprocessing
+    if "fork" not in multiprocessing.get_all_start_methods():
+        warnings.warn(
+            "Pages are rendered serially without the fork start method.")
+        return False
+    try:
+        import pypdf
+    except ImportError:
+        warnings.warn(
+            "Pages are rendered serially without pypdf, "
+            "which is optional for page_workers > 1.")
+        return False
+    return True
+
+
+def _render_shard(render, indices, figure_name):
+    with PdfPages(figure_name) as pdf:
+        render(pdf, indices)
+
+
+def merge_pdfs(filenames, figure_name):
+    """Merge the pages of the PDFs `filenames` in order into `figure_name`"""
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for filename in filenames:
+        writer.append(filename)
+    with open(figure_name, "wb") as f:
+        writer.write(f)
@@ -26,8 +26,8 @@ class PartialDOSPlotter(DOSPlotter):
         self.set_figure_name_prefix("partial_dos")
         self.set_plot_symbol(True)
         self.set_plot_atom(False)
-        self.load_data(variables["data_file"])
 
+        # "symbols" is needed to reduce the atom DOS while loading.
         variables.update({
             "freq_unit": "THz",
             "unit": 1.0,
@@ -35,6 +35,7 @@ class PartialDOSPlotter(DOSPlotter):
             "symbols": symbols,
         })
         self.update_variables(variables)
+        self.load_data(variables["data_file"])
         # self.set_is_horizontal(True)
         # self.plot_dos()
         self.set_is_horizontal(False)
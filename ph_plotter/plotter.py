@@ -6,10 +6,13 @@ import os
 from cycler import cycler
 import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.image import AxesImage
 
 
 __author__ = "Yuji Ikeda"
 
+RASTER_FIGURE_TYPES = ("png", "jpg", "jpeg", "tif", "tiff")
+
 
 def use_classic_ticks():
     # For back-compatibility to matplotlib.1.5.3
@@ -74,6 +77,72 @@ def read_band_labels(phonopy_conf):
     return band_labels
 
 
+def execute_layout(fig, dpi):
+    """Lay out `fig` at `dpi` as `savefig` does"""
+    dpi_original = fig.dpi
+    fig.dpi = dpi
+    try:
+        if hasattr(fig, "get_layout_engine"):  # matplotlib >= 3.6
+            layout_engine = fig.get_layout_engine()
+            if layout_engine is not None:
+                layout_engine.execute(fig)
+        elif fig.get_tight_layout():
+            fig.tight_layout()
+    finally:
+        fig.dpi = dpi_original
+
+
+def keep_layout(fig):
+    """Keep the current layout of `fig` in the later draws"""
+    if hasattr(fig, "set_layout_engine"):  # matplotlib >= 3.6
+        fig.set_layout_engine(None)
+    else:
+        fig.set_tight_layout(False)
+
+
+def rasterize_artist(artist, dpi):
+    """Replace `artist` by the image of it rendered once at `dpi`
+
+    Only `artist` is drawn, on the axes as laid out now, e.g. by
+    `execute_layout`. The image is placed on the axes limits with the same
+    zorder, so the figure can be saved many times without drawing `artist`
+    again. The layout must then be kept, e.g. by `keep_layout`, so that the
+    image is shown pixel by pixel. `artist` is hidden but kept, e.g. as the
+    mappable of the colorbar.
+
+    Returns
+    -------
+    axes_image : AxesImage
+    """
+    from matplotlib.backends.backend_agg import RendererAgg
+
+    ax = artist.axes
+    fig = ax.get_figure()
+    dpi_original = fig.dpi
+    fig.dpi = dpi
+    try:
+        width, height = fig.bbox.size
+        renderer = RendererAgg(int(width), int(height), dpi)
+        artist.draw(renderer)
+        x0, y0, x1, y1 = np.round(ax.bbox.extents).astype(int)
+    finally:
+        fig.dpi = dpi_original
+
+    image = np.asarray(renderer.buffer_rgba())
+    image = image[int(height) - y1:int(height) - y0, x0:x1].copy()
+
+    artist.set_visible(False)
+    axes_image = ax.imshow(
+        image,
+        aspect=ax.get_aspect(),
+        origin="upper",
+        extent=list(ax.get_xlim()) + list(ax.get_ylim()),
+        interpolation="nearest",
+        zorder=artist.get_zorder(),
+    )
+    return axes_image
+
+
 class Plotter(object):
     def __init__(self, variables=None, is_horizontal=False):
         if variables is None:
@@ -110,11 +179,23 @@ class Plotter(object):
             "poscar": "POSCAR",
             "sf_with": "atoms",
             "ninterp": None,
+            "interpolation": "spline",
+            "interp_workers": 1,
+            "raster_method": "nearest",
             "selected_irreps": None,
             "combinations_elements": None,
             "elements": None,
+            "selections": None,
             "points": None,
             "is_filled": False,
+            "weight_min": None,
+            "is_culled": False,
+            "sigma": None,
+            "is_cached": True,
+            "memory_budget": None,
+            "load_workers": 1,
+            "max_selections": 16,
+            "page_workers": 1,
         }
 
     def update_variables(self, variables):
@@ -162,6 +243,10 @@ class Plotter(object):
     def close(self):
         plt.close()
 
+    def close_data(self):
+        """Release the data kept open for plotting, after the last figure"""
+        pass
+
     def create_figure(self):
         fig, ax = self.prepare_figure()
         figure_name = self.create_figure_name()
@@ -175,18 +260,69 @@ class Plotter(object):
     def save_figure(self, fig, figure_name):
         fig.savefig(figure_name, transparent=True)
 
+    def _is_rasterized(self, artist):
+        """Return if `artist` is saved as pixels and is not an image yet"""
+        if isinstance(artist, AxesImage):
+            return False
+        figure_type = self._variables["figure_type"]
+        return artist.get_rasterized() or figure_type in RASTER_FIGURE_TYPES
+
+    def find_frequency_window(self, frequencies):
+        """Return the slice of the sampled frequencies to be plotted
+
+        The samples in [f_min, f_max] are kept together with the nearest
+        ones outside unless a sample lies on the edge, so that the plotted
+        data reach the edges of the axes.
+
+        Parameters
+        ----------
+        frequencies : (nfreq, ) array
+            Sampled frequencies in THz. Unless they are sorted in ascending
+            order, the slice covers all of them.
+        """
+        variables = self._variables
+        if np.any(np.diff(frequencies) < 0.0):
+            return slice(None)
+        f_min = variables["f_min"] / variables["unit"]
+        f_max = variables["f_max"] / variables["unit"]
+        start = np.searchsorted(frequencies, f_min, side="right") - 1
+        end = np.searchsorted(frequencies, f_max, side="left") + 1
+        return slice(max(start, 0), min(end, len(frequencies)))
+
+    def find_visible_bands(self, frequencies_lower, frequencies_upper=None):
+        """Return the indices of the bands overlapping [f_min, f_max]
+
+        Parameters
+        ----------
+        frequencies_lower : (nqpoint, nband) array
+            Frequencies in THz, or the lower edges of the bands.
+        frequencies_upper : (nqpoint, nband) array, optional
+            Upper edges of the bands. `frequencies_lower` by default.
+        """
+        variables = self._variables
+        if frequencies_upper is None:
+            frequencies_upper = frequencies_lower
+        f_min = variables["f_min"] / variables["unit"]
+        f_max = variables["f_max"] / variables["unit"]
+        is_visible = (
+            (np.nanmax(frequencies_upper, axis=0) >= f_min) &
+            (np.nanmin(frequencies_lower, axis=0) <= f_max))
+        return np.where(is_visible)[0]
+
     def run(self):
 
         variables = self._variables
 
         self.load_data(variables["data_file"])
-
-        variables.update({
-            "freq_unit": "THz",
-            "unit": 1.0,
-        })
-        self.update_variables(variables)
-        self.create_figure()
+        try:
+            variables.update({
+                "freq_unit": "THz",
+                "unit": 1.0,
+            })
+            self.update_variables(variables)
+            self.create_figure()
+        finally:
+            self.close_data()
 
         return
 
@@ -10,6 +10,12 @@ __author__ = "Yuji Ikeda"
 
 
 class PointsSFE1Plotter(PointsSFPlotter):
+    def _find_required_keys(self):
+        if self._variables['selected_irreps'] is None:
+            return ['total_sf', 'partial_sf_e_pairs']
+        else:
+            return ['total_sf', 'partial_sf_s', 'partial_sf_s_e_pairs']
+
     def plot_q(self, ax, iq):
         selected_irreps = self._variables['selected_irreps']
         if selected_irreps is None:
@@ -24,8 +30,7 @@ class PointsSFE1Plotter(PointsSFPlotter):
 
         elements = self._data_points[iq]['elements']
 
-        partial_sf = self._data_points[iq]['partial_sf_e']
-        sf_element_pair = np.sum(partial_sf, axis=(1, 3))
+        sf_element_pair = self._data_points[iq]['partial_sf_e_pairs']
 
         for i1, e1 in enumerate(elements):
             for i2, e2 in enumerate(elements):
@@ -70,7 +75,8 @@ class PointsSFE1Plotter(PointsSFPlotter):
             xs = sf
             ys = self._frequencies[iq] * variables["unit"]
 
-        lines_total = ax.plot(
+        lines_total = self._plot_line(
+            ax,
             xs,
             ys,
             color=variables["linecolor"],
@@ -93,20 +99,19 @@ class PointsSFE1Plotter(PointsSFPlotter):
         if pg_symbol not in irs_selected:
             return None
 
-        tmp = data_point['partial_sf_e']
-        partial_sf = np.zeros_like(tmp)  # Initialization
+        tmp = data_point['partial_sf_s_e_pairs'][:, 0]
+        sf_element_pair = np.zeros_like(tmp)  # Initialization
 
         for ir_label_selected in irs_selected[pg_symbol]:
             indices = np.where(ir_labels == ir_label_selected)
             for index in indices:
-                partial_sf += data_point['partial_sf_s_e'][:, index[0]]
+                sf_element_pair += data_point['partial_sf_s_e_pairs'][:, index[0]]
 
         for i1, e1 in enumerate(elements):
             for i2, e2 in enumerate(elements):
                 if i2 < i1:
                     continue
                 label='{}–{}'.format(e1, e2)
-                sf_element_pair = np.sum(partial_sf, axis=(1, 3))
 
                 if i1 == i2:
                     sf = sf_element_pair[:, i1, i2]
@@ -10,6 +10,9 @@ __author__ = "Yuji Ikeda"
 
 
 class PointsSFE2Plotter(PointsSFPlotter):
+    def _find_required_keys(self):
+        return ['total_sf', 'partial_sf_e2']
+
     def plot_q(self, ax, iq):
         if True:
             lines_total = self.plot_total_q(ax, iq)
@@ -14,6 +14,9 @@ class PointsSFIRsPlotter(PointsSFPlotter):
         sf_filename = data_file.replace("band.hdf5", "sf_irreps.dat")
         return sf_filename
 
+    def _find_required_keys(self):
+        return ['total_sf', 'partial_sf_s']
+
     def plot_q(self, ax, iq):
         lines_total = self.plot_total_q(ax, iq)
         lines_symbols = self.plot_irs_q(ax, iq)
@@ -2,16 +2,22 @@
 # -*- coding: utf-8 -*-
 from __future__ import (absolute_import, division,
                         print_function, unicode_literals)
+import functools
 import numpy as np
+import matplotlib.pyplot as plt
 from matplotlib.ticker import AutoMinorLocator
-from matplotlib.backends.backend_pdf import PdfPages
+from ph_plotter.plotter import keep_layout
 from ph_plotter.sf_plotter import SFPlotter
+from ph_plotter.page_renderer import render_pages
 
 
 __author__ = "Yuji Ikeda"
 
 
 class PointsSFPlotter(SFPlotter):
+    # Options of the legends on the pages
+    _legend_kwargs = {}
+
     def configure(self, ax):
         variables = self._variables
 
@@ -65,18 +71,49 @@ class PointsSFPlotter(SFPlotter):
         else:
             indices = range(len(self._xs))
 
-        with PdfPages(figure_name) as pdf:
-            for iq in indices:
-                print(iq, self._data_points[iq]['pointgroup_symbol'])
-                self.configure(ax)
-                self.plot_q(ax, iq)
-                ax.legend()
-                pdf.savefig(dpi=288, transparent=True)
-                ax.clear()
-                self._reset_prop_cycle(ax)
+        # The axes are configured once, and the artists are reused on the
+        # pages with only their data updated.
+        self.configure(ax)
+        self._page_artists = PageArtists(ax, **self._legend_kwargs)
+        render_pages(
+            figure_name,
+            functools.partial(self._render_pages, ax),
+            indices,
+            nworkers=self._variables['page_workers'])
+        self._page_artists = None
 
         self.close()
 
+    def _render_pages(self, ax, pdf, indices):
+        """Save the pages for `indices` to `pdf` by `plot_q`
+
+        `plot_q` draws the page on `ax` by `_plot_line` and `_fill_between`.
+        """
+        fig = ax.get_figure()
+        for iq in indices:
+            print(self._create_page_label(iq))
+            self._page_artists.start_page()
+            self.plot_q(ax, iq)
+            self._page_artists.finish_page()
+            pdf.savefig(dpi=288, transparent=True)
+            # The layout does not change from the first page.
+            keep_layout(fig)
+
+    def _create_page_label(self, iq):
+        return "{} {}".format(iq, self._data_points[iq]['pointgroup_symbol'])
+
+    def _plot_line(self, ax, xs, ys, **kwargs):
+        page_artists = getattr(self, '_page_artists', None)
+        if page_artists is None:
+            return ax.plot(xs, ys, **kwargs)
+        return page_artists.plot(xs, ys, **kwargs)
+
+    def _fill_between(self, ax, xs, ys, **kwargs):
+        page_artists = getattr(self, '_page_artists', None)
+        if page_artists is None:
+            return ax.fill_between(xs, ys, **kwargs)
+        return page_artists.fill_between(xs, ys, **kwargs)
+
     def plot_q(self, ax, iq):
         raise NotImplementedError
 
@@ -92,7 +129,8 @@ class PointsSFPlotter(SFPlotter):
             xs = sf
             ys = self._frequencies[iq] * variables["unit"]
 
-        lines_total = ax.plot(
+        lines_total = self._plot_line(
+            ax,
             xs,
             ys,
             color=variables["linecolor"],
@@ -114,7 +152,8 @@ class PointsSFPlotter(SFPlotter):
             ys = self._frequencies[iq] * variables["unit"]
 
         linewidth = self._variables["linewidth"]
-        lines = ax.plot(
+        lines = self._plot_line(
+            ax,
             xs,
             ys,
             linewidth=linewidth,
@@ -123,7 +162,7 @@ class PointsSFPlotter(SFPlotter):
         )
         if variables['is_filled']:
             # TODO(ikeda): So far this is only for the vertical plot.
-            ax.fill_between(xs, ys, alpha=0.25, **kwargs)
+            self._fill_between(ax, xs, ys, alpha=0.25, **kwargs)
         return lines
 
     def create_list_element_indices(self):
@@ -165,3 +204,99 @@ class PointsSFPlotter(SFPlotter):
     def _reset_prop_cycle(ax):
         # http://matplotlib.org/api/_as_gen/matplotlib.axes.Axes.set_prop_cycle.html#matplotlib.axes.Axes.set_prop_cycle
         ax.set_prop_cycle(None)
+
+
+class PageArtists(object):
+    """Lines and fills reused on the pages drawn on the same axes
+
+    The n-th line (fill) plotted on a page updates the n-th line (fill) of
+    the previous page, and the ones not plotted are hidden. The colors and
+    the dashes are taken from the property cycle restarting on each page,
+    like on cleared axes. The legend is created again with `legend_kwargs`
+    only when its entries change.
+    """
+    def __init__(self, ax, **legend_kwargs):
+        self._ax = ax
+        self._legend_kwargs = legend_kwargs
+        # The axes take the cycle from rcParams when created.
+        self._cycle = list(plt.rcParams['axes.prop_cycle'])
+        self._lines = []
+        self._fills = []
+        self._legend_entries = None
+        self.start_page()
+
+    def start_page(self):
+        self._nlines = 0
+        self._nfills = 0
+        self._ncycled = 0
+        self._entries = []
+
+    def plot(self, xs, ys, **kwargs):
+        # Like `Axes.plot`, the cycle advances unless all of its
+        # properties are given.
+        if any(kwargs.get(k) is None for k in self._cycle[0]):
+            kwargs = dict(self._cycle[self._ncycled % len(self._cycle)], **kwargs)
+            self._ncycled += 1
+        kwargs.setdefault('label', '_nolegend_')
+
+        if self._nlines < len(self._lines):
+            line = self._lines[self._nlines]
+            line.set_data(xs, ys)
+            line.update(kwargs)
+            line.set_visible(True)
+        else:
+            line, = self._ax.plot(xs, ys, **kwargs)
+            self._lines.append(line)
+        self._nlines += 1
+        self._entries.append(tuple(sorted(
+            (k, repr(v)) for k, v in kwargs.items())))
+        return [line]
+
+    def fill_between(self, xs, ys, **kwargs):
+        if 'color' not in kwargs and 'facecolor' not in kwargs:
+            kwargs['facecolor'] = (
+                self._cycle[self._nfills % len(self._cycle)]['color'])
+
+        if self._nfills < len(self._fills):
+            fill = self._fills[self._nfills]
+            fill.set_verts(create_fill_verts(xs, ys))
+            fill.update(kwargs)
+            fill.set_visible(True)
+        else:
+            fill = self._ax.fill_between(xs, ys, **kwargs)
+            self._fills.append(fill)
+        self._nfills += 1
+        return fill
+
+    def finish_page(self):
+        for line in self._lines[self._nlines:]:
+            line.set_visible(False)
+            line.set_label('_nolegend_')
+        for fill in self._fills[self._nfills:]:
+            fill.set_visible(False)
+
+        if self._entries != self._legend_entries:
+            self._ax.legend(**self._legend_kwargs)
+            self._legend_entries = self._entries
+
+
+def create_fill_verts(xs, ys):
+    """Create the polygons of `Axes.fill_between(xs, ys)`
+
+    The polygons are closed at zero, and split where the data are not finite.
+    """
+    xs = np.asarray(xs, dtype=float)
+    ys = np.asarray(ys, dtype=float)
+    is_finite = np.isfinite(xs) & np.isfinite(ys)
+    edges = np.diff(np.concatenate(([0], is_finite.astype(int), [0])))
+    verts = []
+    for start, end in zip(np.where(edges == 1)[0], np.where(edges == -1)[0]):
+        x = xs[start:end]
+        y = ys[start:end]
+        verts.append(np.concatenate((
+            [[x[0], 0.0]],
+            np.column_stack((x, y)),
+            [[x[-1], 0.0]],
+            np.column_stack((x[::-1], np.zeros_like(x))),
+        )))
+    return verts
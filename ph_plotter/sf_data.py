@@ -0,0 +1,412 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+from collections import OrderedDict
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+import numpy as np
+from ph_plotter.file_io import (
+    stack_padded, read_sf_hdf5_columns, find_sf_hdf5_keys,
+    iter_sf_hdf5_column_chunks)
+
+
+__author__ = "Yuji Ikeda"
+
+
+# Columns reduced from Cartesian blocks by `reduce_element_pairs`.
+_ELEMENT_PAIR_COLUMNS = {
+    'partial_sf_e_pairs': 'partial_sf_e',
+    'partial_sf_s_e_pairs': 'partial_sf_s_e',
+}
+
+
+class SFData(object):
+    """Spectral functions stacked over q-points
+
+    Each column is an array whose first axis runs over the q-points.
+    Indexing with a q-point returns a dict-like view for the point-wise
+    plotters, i.e., `SFData` can be used in place of the former list of
+    data points.
+
+    Columns which are not loaded yet are fetched from `source` on first
+    access.
+
+    "partial_sf_e_pairs" and "partial_sf_s_e_pairs" are the real
+    element-pair reductions of "partial_sf_e" and "partial_sf_s_e". They
+    are computed once chunk by chunk over q-points, after which the
+    Cartesian blocks are released if they can be read again from `source`.
+
+    Spectral functions selected from the columns are kept by
+    `get_selection` for repeated plots of the same data.
+    """
+    def __init__(self, columns, nq=None, source=None, max_nbytes=2 ** 28,
+                 max_selections=16):
+        """
+
+        Parameters
+        ----------
+        columns : dict
+            Arrays of shape (nq, ...) already loaded.
+        nq : int, optional
+            Number of q-points. Deduced from `columns` by default.
+        source : SFHDF5Source, optional
+            Source of the columns not loaded yet.
+        max_nbytes : int, optional
+            Size of the chunks of Cartesian blocks reduced at once.
+        max_selections : int, optional
+            Number of selected spectral functions kept in memory.
+        """
+        self._columns = dict(columns)
+        if nq is None:
+            nq = len(next(iter(self._columns.values())))
+        self._nq = nq
+        self._source = source
+        self._max_nbytes = max_nbytes
+        self._irreps_index = None
+        self._selections = SelectionCache(max_selections)
+        if source is None:
+            self._lazy_keys = set()
+        else:
+            self._lazy_keys = set(source.keys()) - set(self._columns)
+
+    @classmethod
+    def from_data_points(cls, data_points):
+        keys = data_points[0].keys()
+        columns = {k: stack_padded([p[k] for p in data_points]) for k in keys}
+        return cls(columns, len(data_points))
+
+    def __len__(self):
+        return self._nq
+
+    def __getitem__(self, iq):
+        if iq < 0:
+            iq += self._nq
+        if not 0 <= iq < self._nq:
+            raise IndexError(iq)
+        return _DataPoint(self, iq)
+
+    def __iter__(self):
+        for iq in range(self._nq):
+            yield self[iq]
+
+    def keys(self):
+        keys = set(self._columns) | self._lazy_keys
+        for key, key_source in _ELEMENT_PAIR_COLUMNS.items():
+            if key_source in keys:
+                keys.add(key)
+        return sorted(keys)
+
+    def has_column(self, key):
+        if key in self._columns or key in self._lazy_keys:
+            return True
+        if key in _ELEMENT_PAIR_COLUMNS:
+            return self.has_column(_ELEMENT_PAIR_COLUMNS[key])
+        return False
+
+    def get_column(self, key):
+        if key not in self._columns:
+            self.load_columns([key])
+        return self._columns[key]
+
+    def get_elements(self):
+        """Return the chemical elements, which must be common to all q-points"""
+        elements = self.get_column('elements')
+        if np.any(elements != elements[0]):
+            raise ValueError("Elements differ among q-points.")
+        return list(elements[0])
+
+    def get_irreps_index(self):
+        """Return the index of irreps by point group and label
+
+        See `create_irreps_index`. The index is created on the first call.
+        """
+        if self._irreps_index is None:
+            self._irreps_index = create_irreps_index(
+                self.get_column('pointgroup_symbol'),
+                self.get_column('ir_labels'))
+        return self._irreps_index
+
+    def get_selection(self, key, create):
+        """Return the selected spectral functions for `key`
+
+        Parameters
+        ----------
+        key : tuple
+            Selection from `create_selection_key`.
+        create : callable
+            Creates the spectral functions when they are not kept yet.
+        """
+        return self._selections.get(key, create)
+
+    def get_selections(self, keys, create):
+        """Return the selected spectral functions for `keys` stacked
+
+        Parameters
+        ----------
+        keys : list of tuples
+            Selections from `create_selection_key`.
+        create : callable
+            Called once with the keys not kept yet and returns their
+            spectral functions stacked along the first axis.
+        """
+        values = {}
+        for key in keys:
+            if key in self._selections:
+                values[key] = self._selections.get(key, None)
+        keys_missing = []
+        for key in keys:
+            if key not in values and key not in keys_missing:
+                keys_missing.append(key)
+        if keys_missing:
+            for key, value in zip(keys_missing, create(keys_missing)):
+                values[key] = self._selections.get(key, lambda: value)
+        return np.stack([values[key] for key in keys])
+
+    def load_columns(self, keys):
+        keys_lazy = [k for k in keys if k in self._lazy_keys]
+        if keys_lazy:
+            print("Reading {}".format(", ".join(keys_lazy)))
+            self._columns.update(self._source.read_columns(keys_lazy))
+            self._lazy_keys -= set(keys_lazy)
+        for key in keys:
+            if key not in self._columns and key in _ELEMENT_PAIR_COLUMNS:
+                self._reduce_column(key)
+
+    def _reduce_column(self, key):
+        key_source = _ELEMENT_PAIR_COLUMNS[key]
+        print("Reducing {} to element pairs".format(key_source))
+        chunks = self.iter_column_chunks(key_source, self._max_nbytes)
+        self._columns[key] = np.concatenate(
+            [reduce_element_pairs(values) for _, _, values in chunks])
+
+        # The Cartesian blocks are not kept when they can be read again.
+        if (key_source in self._columns and
+                self._source is not None and
+                key_source in self._source.keys()):
+            del self._columns[key_source]
+            self._lazy_keys.add(key_source)
+
+    def iter_column_chunks(self, key, max_nbytes):
+        """Yield `(start, end, values)` for consecutive q-point chunks of `key`
+
+        A column not loaded yet is streamed from the source chunk by chunk
+        and is not kept in memory afterwards.
+        """
+        if key in self._columns:
+            column = self._columns[key]
+            nrows = max(int(max_nbytes // max(column[:1].nbytes, 1)), 1)
+            for start in range(0, self._nq, nrows):
+                end = min(start + nrows, self._nq)
+                yield start, end, column[start:end]
+        elif key in self._lazy_keys:
+            for chunk in self._source.iter_column_chunks(key, max_nbytes):
+                yield chunk
+        else:
+            raise KeyError(key)
+
+
+class SelectionCache(object):
+    """Least recently used arrays up to `maxsize`
+
+    The arrays kept are made read-only since they are shared by the callers.
+    """
+    def __init__(self, maxsize=16):
+        self._maxsize = maxsize
+        self._values = OrderedDict()
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def get(self, key, create):
+        if key in self._values:
+            value = self._values.pop(key)
+        else:
+            value = create()
+            value.setflags(write=False)
+        if self._maxsize > 0:
+            self._values[key] = value
+            while len(self._values) > self._maxsize:
+                self._values.popitem(last=False)
+        return value
+
+    def clear(self):
+        self._values.clear()
+
+
+def create_selection_key(irs_selected=None, combinations_elements=None,
+                         elements=None):
+    """Return a hashable key common to equivalent selections
+
+    The order of the point groups, the irreps and the elements does not
+    matter, and a pair of elements is equivalent to its transpose.
+    Repeated entries are kept since they are counted repeatedly.
+
+    Parameters
+    ----------
+    irs_selected : dict, optional
+        {'m-3m': ['A1g', 'Eg']}
+    combinations_elements : list of lists, optional
+        [['Cu', 'Cu'], ['Cu', 'Au']]
+    elements : list, optional
+        ['Cu', 'Au']
+    """
+    key_irs = None
+    if irs_selected is not None:
+        key_irs = tuple(sorted(
+            ((pg_symbol, tuple(sorted(ir_labels, key=repr)))
+             for pg_symbol, ir_labels in irs_selected.items()),
+            key=repr))
+    key_pairs = None
+    if combinations_elements is not None:
+        key_pairs = tuple(sorted(
+            (tuple(sorted(pair, key=repr)) for pair in combinations_elements),
+            key=repr))
+    key_elements = None
+    if elements is not None:
+        key_elements = tuple(sorted(elements, key=repr))
+    return key_irs, key_pairs, key_elements
+
+
+def create_irreps_index(pointgroup_symbols, ir_labels):
+    """Index the irreps at all q-points by point group and label
+
+    Parameters
+    ----------
+    pointgroup_symbols : (nq, ) array
+    ir_labels : (nq, nirreps) array
+        Empty labels mark padding and are not indexed.
+
+    Returns
+    -------
+    index : dict
+        `(str(pointgroup_symbol), ir_label)` -> `(iqs, irs)`, where `irs` is
+        the first irrep having the label at each q-point in `iqs`.
+    """
+    pgs_unique, pg_inverse = np.unique(pointgroup_symbols, return_inverse=True)
+    pg_inverse = pg_inverse.reshape(-1)
+    index = {}
+    for ir_label in np.unique(ir_labels):
+        # Empty labels mark padding.
+        if ir_label == ir_labels.dtype.type():
+            continue
+        is_label = (ir_labels == ir_label)
+        has_label = np.any(is_label, axis=1)
+        irs_first = np.argmax(is_label, axis=1)
+        for ipg, pg_symbol in enumerate(pgs_unique):
+            iqs = np.where(has_label & (pg_inverse == ipg))[0]
+            if len(iqs) > 0:
+                index[(str(pg_symbol), ir_label)] = (iqs, irs_first[iqs])
+    return index
+
+
+def create_element_pair_weights(elements, combinations_elements):
+    """Create the weights of element pairs for `contract_element_pairs`
+
+    Parameters
+    ----------
+    elements : list
+        ['Cu', 'Au']
+    combinations_elements : list of lists
+        [['Cu', 'Cu'], ['Cu', 'Au']]. A pair of different elements also
+        includes its transpose.
+
+    Returns
+    -------
+    weights : (nelements, nelements) array
+    """
+    elements = list(elements)
+    weights = np.zeros((len(elements), len(elements)))
+    for combination_elements in combinations_elements:
+        ie0 = elements.index(combination_elements[0])
+        ie1 = elements.index(combination_elements[1])
+        weights[ie0, ie1] += 1.0
+        if ie0 != ie1:
+            weights[ie1, ie0] += 1.0
+    return weights
+
+
+def reduce_element_pairs(partial_sf_e):
+    """Reduce the Cartesian blocks of `partial_sf_e` to element pairs
+
+    Parameters
+    ----------
+    partial_sf_e : (..., 3, nelements, 3, nelements) array
+
+    Returns
+    -------
+    sf_element_pairs : (..., nelements, nelements) array
+        Real part of the sum over the Cartesian indices.
+    """
+    partial_sf_e = np.ascontiguousarray(partial_sf_e)
+    shape = partial_sf_e.shape[:-4]
+    ndim, nelements = partial_sf_e.shape[-4:-2]
+    projection = np.zeros((ndim, nelements, ndim, nelements, nelements, nelements))
+    for ie0 in range(nelements):
+        for ie1 in range(nelements):
+            projection[:, ie0, :, ie1, ie0, ie1] = 1.0
+    projection = projection.reshape(-1, nelements * nelements)
+    x = partial_sf_e.reshape(int(np.prod(shape)), len(projection))
+    if np.iscomplexobj(x):
+        # Viewed as floats, the imaginary parts get zero weights, so only
+        # the real parts are accumulated in one matrix product.
+        x = x.view(x.real.dtype)
+        projection = np.stack(
+            (projection, np.zeros_like(projection)), axis=1).reshape(
+                -1, nelements * nelements)
+    return x.dot(projection).reshape(shape + (nelements, nelements))
+
+
+def contract_element_pairs(sf_element_pairs, weights):
+    """Sum `sf_element_pairs` over element pairs with `weights`
+
+    Parameters
+    ----------
+    sf_element_pairs : (..., nelements, nelements) array
+    weights : ([nselections, ]nelements, nelements) array
+
+    Returns
+    -------
+    partial_sf : ([nselections, ]...) array
+    """
+    return np.tensordot(weights, sf_element_pairs, axes=([-2, -1], [-2, -1]))
+
+
+class SFHDF5Source(object):
+    """Columns of sf.hdf5 read on demand"""
+    def __init__(self, hdf5_file, nworkers=1):
+        self._hdf5_file = hdf5_file
+        self._nworkers = nworkers
+        self._keys = find_sf_hdf5_keys(hdf5_file)
+
+    def keys(self):
+        return self._keys
+
+    def read_columns(self, keys):
+        return read_sf_hdf5_columns(self._hdf5_file, keys, self._nworkers)
+
+    def iter_column_chunks(self, key, max_nbytes):
+        return iter_sf_hdf5_column_chunks(self._hdf5_file, key, max_nbytes)
+
+
+class _DataPoint(Mapping):
+    """Read-only view of one q-point of `SFData`"""
+    def __init__(self, data, iq):
+        self._data = data
+        self._iq = iq
+
+    def __getitem__(self, key):
+        if not self._data.has_column(key):
+            raise KeyError(key)
+        return self._data.get_column(key)[self._iq]
+
+    def __iter__(self):
+        return iter(self._data.keys())
+
+    def __len__(self):
+        return len(self._data.keys())
@@ -3,10 +3,11 @@
 from __future__ import (absolute_import, division,
                         print_function, unicode_literals)
 import os
-import h5py
 import numpy as np
 from ph_plotter.plotter import Plotter
 from ph_plotter.plotter import read_band_labels
+from ph_plotter.file_io import read_sf_hdf5, read_text_columns
+from ph_plotter.sf_data import SFData, SFHDF5Source
 
 
 __author__ = "Yuji Ikeda"
@@ -14,8 +15,8 @@ __author__ = "Yuji Ikeda"
 
 class SFPlotter(Plotter):
     def load_data(self, data_file='sf.hdf5'):
-        _, extension = os.path.split(data_file)
-        if extension == 'hdf5':
+        _, extension = os.path.splitext(data_file)
+        if extension == '.hdf5':
             self.load_data_hdf5(data_file)
         else:
             self.load_data_text(data_file)
@@ -26,57 +27,60 @@ class SFPlotter(Plotter):
         self._band_labels = band_labels
 
     def load_data_hdf5(self, data_file='sf.hdf5'):
-        with h5py.File(data_file, 'r') as data:
-            self._paths = np.array(data['paths'])
-            npaths, npoints = self._paths.shape[:2]
-
-            frequencies = np.array(data['frequencies'])
-            self._is_squared = np.array(data['is_squared'])
-
-            keys = [
-                'natoms_primitive',
-                'elements',
-                'distance',
-                'pointgroup_symbol',
-                'num_irreps',
-                'ir_labels',
-
-                'total_sf',
-                'partial_sf_s',
-                'partial_sf_e',
-                'partial_sf_s_e',
-                'partial_sf_e2',
-            ]
-            data_points = []
-            distances = []
-            for ipath in range(npaths):
-                distances_on_path = []
-                for ip in range(npoints):
-                    group = '{}/{}/'.format(ipath, ip)
-                    data_points.append(
-                        {k: np.array(data[group + k]) for k in keys if group + k in data}
-                    )
-
-                    distances_on_path.append(
-                        np.array(data[group + 'distance']))
-                distances.append(distances_on_path)
-
-            self._data_points = data_points
-            self._distances = np.array(distances)
+        required_keys = self._find_required_keys()
+        keys = [
+            'natoms_primitive',
+            'elements',
+            'distance',
+            'pointgroup_symbol',
+            'num_irreps',
+            'ir_labels',
+        ] + required_keys
+        nworkers = self._variables['load_workers']
+        paths, frequencies, is_squared, columns = read_sf_hdf5(
+            data_file, keys, nworkers)
+
+        self._paths = paths
+        self._is_squared = is_squared
+        npaths, npoints = self._paths.shape[:2]
+
+        # Keys not required for the plot are read only when accessed.
+        self._data_points = SFData(
+            columns,
+            npaths * npoints,
+            source=SFHDF5Source(data_file, nworkers),
+            **self._find_sf_data_options()
+        )
+        # Reduced columns like "partial_sf_e_pairs" are created here.
+        self._data_points.load_columns(required_keys)
+        self._distances = columns['distance'].reshape(npaths, npoints)
+        if 'ir_labels' in columns and 'pointgroup_symbol' in columns:
+            self._data_points.get_irreps_index()
 
         xs = self._distances.reshape(-1) / np.nanmax(self._distances)
         self._frequencies, self._xs = np.meshgrid(frequencies, xs)
 
+    def _find_sf_data_options(self):
+        options = {'max_selections': self._variables['max_selections']}
+        memory_budget = self._variables['memory_budget']
+        if memory_budget is not None:
+            options['max_nbytes'] = int(memory_budget * 1024 ** 2)
+        return options
+
+    def _find_required_keys(self):
+        """Return the keys of spectral functions required for the plot"""
+        return ['total_sf']
+
     def load_data_text(self, data_file):
-        data = np.loadtxt(data_file, usecols=(0, 1, 2)).T
+        data = read_text_columns(
+            data_file, usecols=(0, 1, 2),
+            is_cached=self._variables['is_cached'])
         nfreq = len(np.unique(data[1]))
         xs                = data[0].reshape(-1, nfreq)
         self._frequencies = data[1].reshape(-1, nfreq)
         total_sf          = data[2].reshape(-1, nfreq)
-        data_points = []
-        for total_sf_point in total_sf:
-            data_points.append({'total_sf': total_sf_point})
-        self._data_points = data_points
+        self._data_points = SFData(
+            {'total_sf': total_sf}, **self._find_sf_data_options())
 
         distances = xs[:, 0]
         npaths = len(distances) - len(np.unique(distances)) + 1
@@ -107,13 +111,12 @@ class SFPlotter(Plotter):
         return sf_label
 
     def create_total_sf(self):
-        total_sf = []
-        for i, data_point in enumerate(self._data_points):
-            total_sf.append(data_point['total_sf'])
-        return np.array(total_sf)
+        return self._data_points.get_column('total_sf')
 
     def get_data_points(self):
         return self._data_points
 
     def set_data_points(self, data_points):
+        if not isinstance(data_points, SFData):
+            data_points = SFData.from_data_points(data_points)
         self._data_points = data_points
@@ -4,7 +4,6 @@ from __future__ import (absolute_import, division,
                         print_function, unicode_literals)
 import numpy as np
 from matplotlib.ticker import AutoMinorLocator
-from matplotlib.backends.backend_pdf import PdfPages
 from ph_plotter.points_sf_plotter import PointsSFPlotter
 from ph_plotter.file_io import read_band_hdf5_dict
 
@@ -13,10 +12,15 @@ __author__ = "Yuji Ikeda"
 
 
 class SpectralFunctionsPlotter(PointsSFPlotter):
+    # The pages are rendered by PointsSFPlotter.create_figure.
+    _legend_kwargs = {"framealpha": 0.5}
+
     def load_data(self, data_file="band.hdf5"):
         print("Reading band.hdf5: ", end="")
-        data = read_band_hdf5_dict(data_file)
+        # Large datasets like "pr_weights" are loaded only when accessed.
+        data = read_band_hdf5_dict(data_file, is_lazy=True)
         print("Finished")
+        self._band_data = data
 
         self._distances   = data["distances"]
 
@@ -25,12 +29,8 @@ class SpectralFunctionsPlotter(PointsSFPlotter):
 
         if "frequencies" in data:
             self._frequencies = data["frequencies"]
-        if "pr_weights" in data:
-            self._pr_weights = data["pr_weights"]
         if "nqstars" in data:
             self._narms = data["nqstars"]
-        if "rot_pr_weights" in data:
-            self._rot_pr_weights = data["rot_pr_weights"]
         if "pg_symbols" in data:
             self._pg_symbols = data["pg_symbols"].reshape(nq)
         if "num_irs" in data:
@@ -40,6 +40,7 @@ class SpectralFunctionsPlotter(PointsSFPlotter):
 
         sf_filename = self._create_sf_filename(data_file)
         self.load_spectral_functions(sf_filename, npath, nqp)
+        self._fwidth = self._ys[0, 1] - self._ys[0, 0]
 
         self.create_list_element_indices()
         # For back-compatibility
@@ -50,28 +51,20 @@ class SpectralFunctionsPlotter(PointsSFPlotter):
 
         return self
 
+    def close_data(self):
+        self._band_data.close()
+
     def _create_sf_filename(self, data_file):
         sf_filename = data_file.replace(
             "band.hdf5", "spectral_functions_atoms.dat")
         return sf_filename
 
-    def plot(self, ax):
-        self._fwidth = self._ys[0, 1] - self._ys[0, 0]
-        figure_name = self.create_figure_name()
-        with PdfPages(figure_name) as pdf:
-            for iq, x in enumerate(self._xs):
-                print(iq)
-                lines_total, lines_symbols = self.plot_q(ax, iq)
-                ax.legend(framealpha=0.5)
-                pdf.savefig(dpi=288, transparent=True)
-                lines_total[0].remove()
-                for lines in lines_symbols:
-                    lines[0].remove()
+    def _create_page_label(self, iq):
+        return str(iq)
 
     def plot_q(self, ax, iq):
-        lines_total = self.plot_total_q(ax, iq)
-        lines_symbols = self.plot_elements_q(ax, iq)
-        return lines_total, lines_symbols
+        self.plot_total_q(ax, iq)
+        self.plot_elements_q(ax, iq)
 
     def plot_total_q(self, ax, iq):
         variables = self._variables
@@ -86,7 +79,8 @@ class SpectralFunctionsPlotter(PointsSFPlotter):
             xs = sf
             ys = freqs * variables["unit"]
 
-        lines_total = ax.plot(
+        lines_total = self._plot_line(
+            ax,
             xs,
             ys,
             color=variables["linecolor"],
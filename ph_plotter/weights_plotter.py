@@ -5,11 +5,12 @@ from __future__ import (absolute_import, division,
 
 __author__ = "Yuji Ikeda"
 
+import functools
 import numpy as np
 from matplotlib.ticker import AutoMinorLocator
-from matplotlib.backends.backend_pdf import PdfPages
 from .plotter import Plotter
 from .file_io import read_band_hdf5
+from .page_renderer import render_pages
 
 
 class WeightsPlotter(Plotter):
@@ -28,9 +29,7 @@ class WeightsPlotter(Plotter):
     def plot(self, ax):
         variables = self._variables
 
-        distances = self._distances
         frequencies = self._frequencies
-        pr_weights = self._pr_weights
 
         freq_label = "Frequency ({})".format(variables["freq_unit"])
         d_freq = variables["d_freq"]
@@ -59,23 +58,31 @@ class WeightsPlotter(Plotter):
 
         figure_name = self.create_figure_name()
         npath, nqpoint, nstar, nband = frequencies.shape
-        pdf = PdfPages(figure_name)
-        for ipath in range(npath):
-            for i, d in enumerate(distances[ipath]):
-                print(ipath, i)
-                f = frequencies[ipath, i]
-                w = pr_weights[ipath, i]
-
-                PC = ax.scatter(
-                    f * variables["unit"],
-                    w,
-                    c=variables["linecolor"],
-                    s=10.0,  # size
-                    edgecolors="None",
-                )
-                pdf.savefig(dpi=288, transparent=True)
-                PC.remove()
-        pdf.close()
+        render_pages(
+            figure_name,
+            functools.partial(self._render_pages, ax),
+            range(npath * nqpoint),
+            nworkers=variables["page_workers"])
+
+    def _render_pages(self, ax, pdf, indices):
+        variables = self._variables
+
+        nqpoint = self._frequencies.shape[1]
+        for index in indices:
+            ipath, i = divmod(index, nqpoint)
+            print(ipath, i)
+            f = self._frequencies[ipath, i]
+            w = self._pr_weights[ipath, i]
+
+            PC = ax.scatter(
+                f * variables["unit"],
+                w,
+                c=variables["linecolor"],
+                s=10.0,  # size
+                edgecolors="None",
+            )
+            pdf.savefig(dpi=288, transparent=True)
+            PC.remove()
 
     def create_figure_name(self):
         variables = self._variables
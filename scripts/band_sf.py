@@ -25,6 +25,10 @@ def run(variables):
         from ph_plotter.band_sf_imshow_plotter import (
             BandSFImshowPlotter as BandSFPlotter)
 
+    elif plot_style == "raster":
+        from ph_plotter.band_sf_raster_plotter import (
+            BandSFRasterPlotter as BandSFPlotter)
+
     BandSFPlotter(variables).run()
 
 
@@ -38,12 +42,22 @@ def main():
                         help="Filename of data.")
     parser.add_argument("--plot_style",
                         type=str,
-                        choices=["mesh", "contour", "imshow"],
+                        choices=["mesh", "contour", "imshow", "raster"],
                         required=True,
                         help="Plot style for spectral fucntions.")
+    parser.add_argument("--raster_method",
+                        type=str,
+                        choices=["nearest", "linear"],
+                        help="Resampling of the grid on pixels for raster.")
     parser.add_argument("--ninterp",
                         type=int,
                         help="Interpolation number.")
+    parser.add_argument("--interpolation",
+                        choices=["spline", "griddata"],
+                        help="Interpolation method for --ninterp.")
+    parser.add_argument("--interp_workers",
+                        type=int,
+                        help="Number of threads interpolating paths.")
     parser.add_argument("--selected_irreps",
                         type=json.loads,
                         help="Specification of Small Reps. ex. {'mm2': ['B2']}")
@@ -55,6 +69,21 @@ def main():
                         nargs='+',
                         type=str,
                         help="Specification of elements. ex. Cu Au")
+    parser.add_argument("--selections",
+                        type=json.loads,
+                        help="Selections plotted from one pass, ex. "
+                        "'[{\"elements\": [\"Cu\"]}, "
+                        "{\"name\": \"Cu-Au\", "
+                        "\"combinations_elements\": [[\"Cu\", \"Au\"]]}]'")
+    parser.add_argument("--memory_budget",
+                        type=float,
+                        help="Memory (MiB) for reducing element pairs chunk by chunk.")
+    parser.add_argument("--load_workers",
+                        type=int,
+                        help="Number of processes reading paths concurrently.")
+    parser.add_argument("--max_selections",
+                        type=int,
+                        help="Number of selected spectral functions kept in memory.")
     args = parser.parse_args()
 
     if args.combinations_elements is not None:
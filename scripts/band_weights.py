@@ -9,7 +9,15 @@ from ph_plotter.common_arguments_adder import CommonArgumentsAdder
 
 
 def run(variables):
-    from ph_plotter.band_weights_plotter import BandWeightsPlotter
+    plot_style = variables.pop("plot_style")
+
+    if plot_style == "scatter":
+        from ph_plotter.band_weights_plotter import BandWeightsPlotter
+
+    elif plot_style == "histogram":
+        from ph_plotter.band_weights_histogram_plotter import (
+            BandWeightsHistogramPlotter as BandWeightsPlotter)
+
     BandWeightsPlotter(variables).run()
 
 
@@ -21,6 +29,21 @@ def main():
                         default="band.hdf5",
                         type=str,
                         help="Filename of data.")
+    parser.add_argument("--plot_style",
+                        type=str,
+                        choices=["scatter", "histogram"],
+                        default="scatter",
+                        help="Plot style for weights.")
+    parser.add_argument("--sigma",
+                        type=float,
+                        help="Gaussian broadening in frequency for histogram.")
+    parser.add_argument("--weight_min",
+                        type=float,
+                        help="Points with weights not larger than this are not plotted.")
+    parser.add_argument("--cull",
+                        dest="is_culled",
+                        action="store_true",
+                        help="Points outside the frequency range are not plotted.")
     args = parser.parse_args()
 
     print("This script may not be useful.")
@@ -21,6 +21,9 @@ def main():
                         default="sf_fitted.hdf5",
                         type=str,
                         help="Filename of data.")
+    parser.add_argument("--load_workers",
+                        type=int,
+                        help="Number of processes reading paths concurrently.")
     args = parser.parse_args()
 
     print(vars(args))
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+__author__ = "Yuji Ikeda"
+
+
+def run(variables):
+    from ph_plotter.file_io import write_sf_hdf5_columnar
+    write_sf_hdf5_columnar(
+        variables["data_file"],
+        variables["output_file"],
+        chunk_nbytes=int(variables["chunk_size"] * 1024 ** 2))
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="Repack sf.hdf5 into the columnar layout.")
+    parser.add_argument("--data_file",
+                        default="sf.hdf5",
+                        type=str,
+                        help="Filename of data.")
+    parser.add_argument("--output_file",
+                        default="sf_columnar.hdf5",
+                        type=str,
+                        help="Filename of the repacked data.")
+    parser.add_argument("--chunk_size",
+                        default=4.0,
+                        type=float,
+                        help="Approximate size of HDF5 chunks (MiB).")
+    args = parser.parse_args()
+
+    print(vars(args))
+    run(vars(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -54,6 +54,12 @@ def main():
     parser.add_argument("--fill", dest='is_filled',
                         action='store_true',
                         help='Partial SFs are filled by color.')
+    parser.add_argument("--load_workers",
+                        type=int,
+                        help="Number of processes reading paths concurrently.")
+    parser.add_argument("--page_workers",
+                        type=int,
+                        help="Number of processes rendering pages of the PDF.")
     args = parser.parse_args()
 
     print(vars(args))
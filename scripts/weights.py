@@ -21,6 +21,9 @@ def main():
                         default="band.hdf5",
                         type=str,
                         help="Filename of data.")
+    parser.add_argument("--page_workers",
+                        type=int,
+                        help="Number of processes rendering pages of the PDF.")
     args = parser.parse_args()
 
     print(vars(args))
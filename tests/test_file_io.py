@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import numpy as np
+import pytest
+from ph_plotter.file_io import LazyHDF5Dict
+
+
+__author__ = "Yuji Ikeda"
+
+
+def test_lazy_hdf5_dict_read_slice(tmp_path, monkeypatch):
+    h5py = pytest.importorskip("h5py")
+    filename = str(tmp_path / "band.hdf5")
+    pr_weights = np.arange(2 * 3 * 4 * 5, dtype=float).reshape(2, 3, 4, 5)
+    with h5py.File(filename, "w") as f:
+        f.create_dataset("pr_weights", data=pr_weights)
+
+    requested = []
+    read = h5py.Dataset.__getitem__
+
+    def read_recorded(dataset, index, *args, **kwargs):
+        values = read(dataset, index, *args, **kwargs)
+        requested.append(np.asarray(values).size)
+        return values
+
+    def read_whole(dataset, *args, **kwargs):
+        raise AssertionError("The whole dataset is loaded.")
+
+    monkeypatch.setattr(h5py.Dataset, "__getitem__", read_recorded)
+    monkeypatch.setattr(h5py.Dataset, "__array__", read_whole)
+
+    with LazyHDF5Dict(filename) as data:
+        values = data.read_slice("pr_weights", (1, slice(0, 2), 3))
+        np.testing.assert_array_equal(values, pr_weights[1, 0:2, 3])
+        assert requested == [values.size]
+        assert "pr_weights" not in data._data
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import re
+import sys
+import pytest
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+from ph_plotter.page_renderer import merge_pdfs, render_pages
+from ph_plotter.points_sf_plotter import PointsSFPlotter
+from ph_plotter.sf_data import SFData
+
+
+__author__ = "Yuji Ikeda"
+
+try:
+    import pypdf
+except ImportError:
+    pypdf = None
+
+requires_pypdf = pytest.mark.skipif(pypdf is None, reason="requires pypdf")
+
+
+def render(pdf, indices):
+    """Save a page for each index, `index + 1` inches wide"""
+    fig = plt.figure()
+    for index in indices:
+        fig.set_size_inches(index + 1, 1)
+        pdf.savefig(fig)
+    plt.close(fig)
+
+
+def read_page_indices(filename):
+    """Return the indices of the pages saved by `render`
+
+    The page objects written by Matplotlib are read in order, so pypdf is
+    not needed.
+    """
+    with open(filename, "rb") as f:
+        widths = re.findall(br"/MediaBox \[ *0 0 ([0-9.]+)", f.read())
+    return [int(round(float(w) / 72.0)) - 1 for w in widths]
+
+
+@requires_pypdf
+def test_merge_pdfs(tmp_path):
+    shards = [[0, 1, 2], [3], [4, 5]]
+    filenames = []
+    for i, shard in enumerate(shards):
+        filename = str(tmp_path / "{}.pdf".format(i))
+        with PdfPages(filename) as pdf:
+            render(pdf, shard)
+        filenames.append(filename)
+
+    figure_name = str(tmp_path / "merged.pdf")
+    merge_pdfs(filenames, figure_name)
+
+    reader = pypdf.PdfReader(figure_name)
+    widths = [float(page.mediabox.width) / 72.0 for page in reader.pages]
+    assert widths == [1.0, 2.0, 3.0, 4.0, 5.0, 6.0]
+
+
+def test_render_pages_serial(tmp_path):
+    indices = [4, 0, 3, 1, 2]
+    figure_name = str(tmp_path / "pages.pdf")
+    render_pages(figure_name, render, indices, nworkers=1)
+
+    assert read_page_indices(figure_name) == indices
+
+
+@requires_pypdf
+def test_render_pages_parallel(tmp_path):
+    indices = [4, 0, 3, 1, 2]
+    figure_name = str(tmp_path / "pages.pdf")
+    render_pages(figure_name, render, indices, nworkers=3)
+
+    reader = pypdf.PdfReader(figure_name)
+    widths = [float(page.mediabox.width) / 72.0 for page in reader.pages]
+    assert widths == [5.0, 1.0, 4.0, 2.0, 3.0]
+    assert [p.name for p in tmp_path.iterdir()] == ["pages.pdf"]
+
+
+def test_render_pages_without_pypdf(tmp_path, monkeypatch):
+    # The import of a module mapped to None fails.
+    monkeypatch.setitem(sys.modules, "pypdf", None)
+    indices = [4, 0, 3, 1, 2]
+    figure_name = str(tmp_path / "pages.pdf")
+    with pytest.warns(UserWarning, match="serially"):
+        render_pages(figure_name, render, indices, nworkers=3)
+
+    assert read_page_indices(figure_name) == indices
+
+
+class LinesSFPlotter(PointsSFPlotter):
+    """Plot a number of lines changing with the q-point"""
+    def plot_q(self, ax, iq):
+        self.plot_total_q(ax, iq)
+        total_sf = self._data_points[iq]['total_sf']
+        for i in range(iq % 3 + 1):
+            self._plot_curve(
+                ax, iq, total_sf * (i + 1) / 4.0, label="Line {}".format(i))
+
+
+def render_points_sf(figure_name, nworkers):
+    nq = 7
+    frequencies = np.linspace(-2.0, 10.0, 101)
+    total_sf = np.exp(-(frequencies - np.arange(nq)[:, None]) ** 2)
+    plotter = LinesSFPlotter({
+        'figure_type': 'pdf',
+        'is_filled': True,
+        'page_workers': nworkers,
+    })
+    plotter._is_squared = True
+    plotter._frequencies, plotter._xs = np.meshgrid(
+        frequencies, np.arange(nq))
+    plotter._data_points = SFData({
+        'total_sf': total_sf,
+        'pointgroup_symbol': np.array(['m-3m'] * nq),
+    })
+    plotter.create_figure_name = lambda: figure_name
+    plotter.create_figure()
+
+
+def read_page(page):
+    """Return the drawing operations, the graphics states and the size"""
+    resources = page["/Resources"].get_object()
+    states = resources.get("/ExtGState", {})
+    states = {
+        k: sorted((kk, repr(vv)) for kk, vv in v.get_object().items())
+        for k, v in states.get_object().items()}
+    return (
+        page.get_contents().get_data(),
+        states,
+        [float(x) for x in page.mediabox],
+    )
+
+
+@requires_pypdf
+def test_points_sf_pages_parallel(tmp_path):
+    """The pages rendered by workers are the same as the serial ones"""
+    pages = []
+    for nworkers in (1, 3):
+        figure_name = str(tmp_path / "points_{}.pdf".format(nworkers))
+        render_points_sf(figure_name, nworkers)
+        reader = pypdf.PdfReader(figure_name)
+        pages.append([read_page(page) for page in reader.pages])
+
+    assert len(pages[0]) == 7
+    assert pages[1] == pages[0]